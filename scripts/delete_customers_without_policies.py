@@ -7,6 +7,9 @@ import os
 from supabase import create_client, Client
 from pathlib import Path
 
+# Customers per DELETE request (keeps the IN (...) list in the URL short)
+DELETE_BATCH_SIZE = 200
+
 def get_supabase_client() -> Client:
     """Get Supabase client connection"""
     # Try to get credentials from Streamlit secrets first
@@ -14,8 +17,12 @@ def get_supabase_client() -> Client:
     
     if secrets_path.exists():
         try:
-            import toml
-            secrets = toml.load(secrets_path)
+            try:
+                import tomllib
+            except ImportError:  # Python < 3.11
+                import tomli as tomllib
+            with open(secrets_path, 'rb') as f:
+                secrets = tomllib.load(f)
             url = secrets['supabase']['url']
             key = secrets['supabase']['key']
         except Exception as e:
@@ -32,6 +39,33 @@ def get_supabase_client() -> Client:
     print(f"   Using Supabase URL: {url[:30]}...")
     return create_client(url, key)
 
+def find_customers_without_policies(supabase):
+    """Find customers without policies, letting the database do the anti-join"""
+    try:
+        print("📊 Fetching customers without policies...")
+        return supabase.rpc('get_orphan_customers').execute().data
+    except Exception as e:
+        # get_orphan_customers() not installed yet (see supabase_schema.sql)
+        print(f"   ⚠️  get_orphan_customers unavailable ({e}), comparing tables instead")
+    
+    # Get all customers
+    print("📊 Fetching all customers...")
+    customers_response = supabase.table('customers').select('customer_id, customer_name').execute()
+    all_customers = customers_response.data
+    print(f"   Found {len(all_customers)} total customers")
+    
+    # Get all customer IDs that have policies
+    print("📋 Fetching all policies...")
+    policies_response = supabase.table('policies').select('customer_id').execute()
+    customer_ids_with_policies = set(policy['customer_id'] for policy in policies_response.data)
+    print(f"   Found {len(customer_ids_with_policies)} customers with policies")
+    
+    # Find customers without policies
+    return [
+        customer for customer in all_customers 
+        if customer['customer_id'] not in customer_ids_with_policies
+    ]
+
 def delete_customers_without_policies():
     """Delete all customers who don't have any policies"""
     
@@ -39,23 +73,7 @@ def delete_customers_without_policies():
     supabase = get_supabase_client()
     
     try:
-        # Get all customers
-        print("📊 Fetching all customers...")
-        customers_response = supabase.table('customers').select('customer_id, customer_name').execute()
-        all_customers = customers_response.data
-        print(f"   Found {len(all_customers)} total customers")
-        
-        # Get all customer IDs that have policies
-        print("📋 Fetching all policies...")
-        policies_response = supabase.table('policies').select('customer_id').execute()
-        customer_ids_with_policies = set(policy['customer_id'] for policy in policies_response.data)
-        print(f"   Found {len(customer_ids_with_policies)} customers with policies")
-        
-        # Find customers without policies
-        customers_without_policies = [
-            customer for customer in all_customers 
-            if customer['customer_id'] not in customer_ids_with_policies
-        ]
+        customers_without_policies = find_customers_without_policies(supabase)
         
         if not customers_without_policies:
             print("✅ No customers found without policies. Database is clean!")
@@ -78,13 +96,24 @@ def delete_customers_without_policies():
         print("\n🗑️  Deleting customers without policies...")
         deleted_count = 0
         
-        for customer in customers_without_policies:
+        for start in range(0, len(customers_without_policies), DELETE_BATCH_SIZE):
+            batch = customers_without_policies[start:start + DELETE_BATCH_SIZE]
             try:
-                supabase.table('customers').delete().eq('customer_id', customer['customer_id']).execute()
-                deleted_count += 1
-                print(f"   ✓ Deleted: {customer['customer_name']}")
+                supabase.table('customers').delete().in_('customer_id', [c['customer_id'] for c in batch]).execute()
+                deleted_count += len(batch)
+                for customer in batch:
+                    print(f"   ✓ Deleted: {customer['customer_name']}")
+                continue
             except Exception as e:
-                print(f"   ✗ Failed to delete {customer['customer_name']}: {e}")
+                print(f"   ⚠️  Batch delete failed, retrying one customer at a time: {e}")
+            
+            for customer in batch:
+                try:
+                    supabase.table('customers').delete().eq('customer_id', customer['customer_id']).execute()
+                    deleted_count += 1
+                    print(f"   ✓ Deleted: {customer['customer_name']}")
+                except Exception as e:
+                    print(f"   ✗ Failed to delete {customer['customer_name']}: {e}")
         
         print(f"\n✅ Successfully deleted {deleted_count} out of {len(customers_without_policies)} customers")
         print("🎉 Cleanup complete!")
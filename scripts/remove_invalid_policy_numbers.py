@@ -7,11 +7,32 @@ whose policy numbers have more than 9 digits
 import os
 import sys
 import sqlite3
+from pathlib import Path
+from collections import defaultdict
+from functools import lru_cache
 from supabase import create_client, Client
-import toml
 
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+# Server-side (POSIX) regex; a superset of the policy numbers that have more
+# than 9 digits once dots, dashes and surrounding spaces are removed
+INVALID_POLICY_CANDIDATE_RE = '^[0-9.[:space:]-]{10,}$'
+
+# Separators ignored when counting a policy number's digits
+DROP_SEPARATORS = str.maketrans('', '', '.-')
+
+# Rows per page when reading policies (PostgREST's default max-rows)
+PAGE_SIZE = 1000
+
+# Customer IDs per IN (...) request (stays under PostgREST URL limits)
+DELETE_BATCH_SIZE = 500
+
+@lru_cache(maxsize=1)
 def get_supabase_client() -> Client:
-    """Initialize and return Supabase client"""
+    """Initialize and return Supabase client (created once, then reused)"""
     supabase_url = None
     supabase_key = None
     
@@ -20,7 +41,8 @@ def get_supabase_client() -> Client:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         secrets_path = os.path.join(script_dir, '.streamlit', 'secrets.toml')
         if os.path.exists(secrets_path):
-            secrets = toml.load(secrets_path)
+            with open(secrets_path, 'rb') as f:
+                secrets = tomllib.load(f)
             # Check if nested under [supabase]
             if 'supabase' in secrets:
                 supabase_url = secrets['supabase'].get('url')
@@ -42,45 +64,69 @@ def get_supabase_client() -> Client:
     
     return create_client(supabase_url, supabase_key)
 
+def normalize_policy_number(policy_number):
+    """Drop dots and dashes in one translate pass, then trim surrounding whitespace"""
+    return str(policy_number).translate(DROP_SEPARATORS).strip()
+
 def find_invalid_policies(supabase: Client):
     """Find all policies with more than 9 digits"""
     print("🔍 Searching for policies with invalid policy numbers (more than 9 digits)...")
     
-    # Get all policies
-    response = supabase.table('policies').select('policy_number, customer_id').execute()
-    
+    # Let Postgres pre-filter to candidates: 10+ characters of digits, dots,
+    # dashes or spaces. Only those rows cross the network, a page at a time
+    # (ordered so pages don't overlap); the exact check below still decides
+    # which of them are invalid.
     invalid_policies = []
-    for policy in response.data:
-        policy_number = str(policy['policy_number']).replace('.', '').replace('-', '').strip()
-        # Check if it's all digits and has more than 9 digits
-        if policy_number.isdigit() and len(policy_number) > 9:
-            invalid_policies.append(policy)
+    offset = 0
+    while True:
+        response = (
+            supabase.table('policies')
+            .select('policy_number, customer_id')
+            .filter('policy_number', 'match', INVALID_POLICY_CANDIDATE_RE)
+            .order('policy_number')
+            .range(offset, offset + PAGE_SIZE - 1)
+            .execute()
+        )
+        
+        for policy in response.data:
+            policy_number = normalize_policy_number(policy['policy_number'])
+            # Check if it has more than 9 digits and is all digits (length first - it's O(1))
+            if len(policy_number) > 9 and policy_number.isdigit():
+                invalid_policies.append(policy)
+        
+        if len(response.data) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
     
     return invalid_policies
 
 def get_customers_to_remove(supabase: Client, invalid_policies: list):
     """Get unique customer IDs from invalid policies"""
-    customer_ids = set()
-    customer_info = {}
-    
+    # Pass 1: group the invalid policies by customer
+    policies_by_customer = defaultdict(list)
     for policy in invalid_policies:
-        customer_id = policy['customer_id']
-        customer_ids.add(customer_id)
-        
-        if customer_id not in customer_info:
-            # Get customer details
-            customer = supabase.table('customers').select('customer_id, customer_name').eq('customer_id', customer_id).execute()
-            if customer.data:
-                customer_info[customer_id] = {
-                    'name': customer.data[0]['customer_name'],
-                    'policies': []
-                }
-        
-        customer_info[customer_id]['policies'].append({
+        policies_by_customer[policy['customer_id']].append({
             'policy_number': policy['policy_number']
         })
+    customer_ids = list(policies_by_customer)
+    
+    # Pass 2: fetch the customer details in a few IN queries instead of one per customer
+    customer_names = {}
+    for start in range(0, len(customer_ids), DELETE_BATCH_SIZE):
+        chunk = customer_ids[start:start + DELETE_BATCH_SIZE]
+        customers = supabase.table('customers').select('customer_id, customer_name').in_('customer_id', chunk).execute()
+        for customer in customers.data:
+            customer_names[customer['customer_id']] = customer['customer_name']
     
-    return list(customer_ids), customer_info
+    customer_info = {
+        customer_id: {
+            'name': customer_names.get(customer_id, 'Unknown'),
+            'policies': policies
+        }
+        for customer_id, policies in policies_by_customer.items()
+    }
+    
+    return customer_ids, customer_info
 
 def remove_from_supabase(supabase: Client, customer_ids: list, dry_run: bool = True):
     """Remove customers and their policies from Supabase"""
@@ -90,31 +136,68 @@ def remove_from_supabase(supabase: Client, customer_ids: list, dry_run: bool = T
         'errors': 0
     }
     
-    for customer_id in customer_ids:
+    if dry_run:
+        return stats
+    
+    for start in range(0, len(customer_ids), DELETE_BATCH_SIZE):
+        chunk = customer_ids[start:start + DELETE_BATCH_SIZE]
         try:
-            if not dry_run:
-                # Delete policies first (due to foreign key constraint)
-                policies_response = supabase.table('policies').delete().eq('customer_id', customer_id).execute()
-                stats['policies_deleted'] += len(policies_response.data) if policies_response.data else 0
-                
-                # Delete customer
-                customer_response = supabase.table('customers').delete().eq('customer_id', customer_id).execute()
-                stats['customers_deleted'] += 1
+            # Count the policies for the summary (headers only, no rows)
+            policies_response = (
+                supabase.table('policies')
+                .select('policy_number', count='exact', head=True)
+                .in_('customer_id', chunk)
+                .execute()
+            )
+            policy_count = policies_response.count or 0
+            
+            # policies.customer_id is ON DELETE CASCADE (supabase_schema.sql),
+            # so one DELETE removes the customers and their policies together
+            customer_response = supabase.table('customers').delete().in_('customer_id', chunk).execute()
+            stats['policies_deleted'] += policy_count
+            stats['customers_deleted'] += len(customer_response.data) if customer_response.data else 0
         except Exception as e:
-            print(f"❌ Error deleting customer {customer_id} from Supabase: {e}")
+            print(f"❌ Error deleting customers {chunk[0]}..{chunk[-1]} from Supabase: {e}")
             stats['errors'] += 1
     
     return stats
 
+def get_sqlite_path():
+    """Path of the local SQLite database next to this script"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, 'lic_customers.db')
+
+def count_sqlite(customer_ids: list):
+    """Count the SQLite policies that would be deleted (read-only; 0 if there is no database)"""
+    db_path = get_sqlite_path()
+    if not os.path.exists(db_path):
+        return 0
+    
+    policy_count = 0
+    try:
+        # mode=ro: a dry run never takes a write lock or touches the journal
+        conn = sqlite3.connect(Path(db_path).as_uri() + '?mode=ro', uri=True)
+        for start in range(0, len(customer_ids), DELETE_BATCH_SIZE):
+            chunk = customer_ids[start:start + DELETE_BATCH_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            policy_count += conn.execute(f"SELECT COUNT(*) FROM policies WHERE customer_id IN ({placeholders})", chunk).fetchone()[0]
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error counting policies in SQLite database: {e}")
+    
+    return policy_count
+
 def remove_from_sqlite(customer_ids: list, dry_run: bool = True):
     """Remove customers and their policies from local SQLite database"""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(script_dir, 'lic_customers.db')
+    db_path = get_sqlite_path()
     
     if not os.path.exists(db_path):
         print(f"⚠️  SQLite database not found at {db_path}")
         return {'policies_deleted': 0, 'customers_deleted': 0, 'errors': 0}
     
+    if dry_run:
+        return {'policies_deleted': count_sqlite(customer_ids), 'customers_deleted': len(customer_ids), 'errors': 0}
+    
     stats = {
         'policies_deleted': 0,
         'customers_deleted': 0,
@@ -125,28 +208,36 @@ def remove_from_sqlite(customer_ids: list, dry_run: bool = True):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        for customer_id in customer_ids:
+        # Same tuning as the PDF processor's local backup: WAL + NORMAL
+        # means one fsync per commit instead of the rollback journal's two
+        conn.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA cache_size = -64000;
+            PRAGMA temp_store = MEMORY;
+        ''')
+        
+        # Without an index on customer_id every DELETE below scans the whole
+        # policies table (idempotent; only builds it on the first run)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_policies_customer_id ON policies(customer_id)")
+        
+        # Two IN (...) statements per chunk, all inside one transaction
+        conn.execute('BEGIN')
+        for start in range(0, len(customer_ids), DELETE_BATCH_SIZE):
+            chunk = customer_ids[start:start + DELETE_BATCH_SIZE]
+            placeholders = ','.join('?' * len(chunk))
             try:
-                if not dry_run:
-                    # Delete policies first
-                    cursor.execute("DELETE FROM policies WHERE customer_id = ?", (customer_id,))
-                    stats['policies_deleted'] += cursor.rowcount
-                    
-                    # Delete customer
-                    cursor.execute("DELETE FROM customers WHERE customer_id = ?", (customer_id,))
-                    stats['customers_deleted'] += cursor.rowcount
-                else:
-                    # Count what would be deleted
-                    cursor.execute("SELECT COUNT(*) FROM policies WHERE customer_id = ?", (customer_id,))
-                    stats['policies_deleted'] += cursor.fetchone()[0]
-                    stats['customers_deleted'] += 1
-                    
+                # Delete policies first
+                cursor.execute(f"DELETE FROM policies WHERE customer_id IN ({placeholders})", chunk)
+                stats['policies_deleted'] += cursor.rowcount
+                
+                # Delete customers
+                cursor.execute(f"DELETE FROM customers WHERE customer_id IN ({placeholders})", chunk)
+                stats['customers_deleted'] += cursor.rowcount
             except Exception as e:
-                print(f"❌ Error deleting customer {customer_id} from SQLite: {e}")
+                print(f"❌ Error deleting customers {chunk[0]}..{chunk[-1]} from SQLite: {e}")
                 stats['errors'] += 1
-        
-        if not dry_run:
-            conn.commit()
+        conn.commit()
         conn.close()
         
     except Exception as e:
@@ -193,7 +284,7 @@ def main():
         print(f"Customer: {info['name']} (ID: {customer_id})")
         for policy in info['policies']:
             policy_num = str(policy['policy_number'])
-            digit_count = len(policy_num.replace('.', '').replace('-', '').strip())
+            digit_count = len(normalize_policy_number(policy_num))
             print(f"  - Policy: {policy_num} ({digit_count} digits)")
         print()
     
@@ -223,14 +314,14 @@ def main():
         print("\n✅ Deletion complete!")
     else:
         # Dry run - show what would be deleted
-        sqlite_stats = remove_from_sqlite(customer_ids, dry_run=True)
+        sqlite_policy_count = count_sqlite(customer_ids)
         
         print("="*80)
         print("📊 DRY RUN SUMMARY - What would be deleted:")
         print("="*80)
         print(f"Customers: {len(customer_ids)}")
         print(f"Policies (Supabase): {len(invalid_policies)}")
-        print(f"Policies (SQLite): {sqlite_stats['policies_deleted']}")
+        print(f"Policies (SQLite): {sqlite_policy_count}")
         print("\n⚠️  DRY RUN MODE - No changes were made to the databases")
         print("Run with --execute flag to actually delete the data")
 
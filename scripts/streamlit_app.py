@@ -1,14 +1,132 @@
 import streamlit as st
+import calendar
 import pandas as pd
 from pathlib import Path
 import re
-from datetime import datetime, date
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from itertools import combinations
 from dateutil.relativedelta import relativedelta
 import os
 from supabase import create_client, Client
 
+# Form validation patterns, compiled once
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_CLEAN_RE = re.compile(r'[^\d+]')
+PHONE_RE = re.compile(r'^\+91\d{10}$')
+NON_DIGIT_RE = re.compile(r'[^\d]')
+
+# FUP date layouts seen in the policies table, tried in order
+FUP_DATE_FORMATS = ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d-%m-%y')
+
+# Identifiers compared by find_potential_duplicates, in match-reason order
+DUPLICATE_MATCH_FIELDS = (
+    ('customer_name', "Same name"),
+    ('phone_number', "Same phone"),
+    ('aadhaar_number', "Same Aadhaar"),
+    ('date_of_birth', "Same DOB"),
+)
+
+# Columns the customer search results actually use (cards, edit forms,
+# duplicate detection) - not '*', which also ships photo paths and audit fields
+CUSTOMER_SELECT = (
+    'customer_id, customer_name, nickname, phone_number, alt_phone_number, email, '
+    'aadhaar_number, date_of_birth, occupation, full_address, google_maps_link, '
+    'notes, last_updated, '
+    'policies(policy_number, plan_name, agent_code, payment_period, premium_amount, '
+    'sum_assured, policy_term, date_of_commencement, current_fup_date, maturity_date, '
+    'last_payment_date, last_updated, premium_records(due_date, due_count))'
+)
+
+# Payment terms offered by the policy forms, and each one's selectbox index
+PAYMENT_TERMS = ('Yearly', 'Half-Yearly', 'Quarterly', 'Monthly', 'One-time')
+PAYMENT_TERM_INDEX = {term: index for index, term in enumerate(PAYMENT_TERMS)}
+
+# Stored payment modes (lowercased, spaces and hyphens removed) → calculator option
+PAYMENT_MODE_MAP = {
+    'monthly': 'Monthly', 'month': 'Monthly', 'm': 'Monthly',
+    'quarterly': 'Quarterly', 'quarter': 'Quarterly', 'q': 'Quarterly', '3months': 'Quarterly',
+    'halfyearly': 'HalfYearly', 'semiannual': 'HalfYearly', 'h': 'HalfYearly', '6months': 'HalfYearly',
+    'yearly': 'Yearly', 'annual': 'Yearly', 'annually': 'Yearly', 'year': 'Yearly', 'y': 'Yearly',
+    '12months': 'Yearly',
+}
+
+# Indian National Holidays as (month, day) - built once, hashed lookups
+INDIAN_HOLIDAYS = frozenset({
+    (1, 26),   # Republic Day
+    (8, 15),   # Independence Day
+    (10, 2),   # Gandhi Jayanti
+    # Add other major holidays as needed
+})
+
+# Color palette for distinguishing customer cards
+CARD_COLORS = [
+    '#E8F4FD',  # Light blue
+    '#FFF4E6',  # Light orange
+    '#E8F8F5',  # Light green
+    '#F4E8FD',  # Light purple
+    '#FDE8F4',  # Light pink
+    '#FFFACD',  # Light yellow
+    '#E0F2F1',  # Light teal
+    '#FFF0F5',  # Light lavender
+]
+
+# Card styles for every expander position, cycling through CARD_COLORS with
+# nth-of-type(8n+k) - injected once per result list rather than once per card
+CARD_STYLESHEET = "<style>" + "".join(
+    f"""
+    div[data-testid="stExpander"]:nth-of-type({len(CARD_COLORS)}n+{i + 1}) {{
+        background: linear-gradient(145deg, {color}, #ffffff);
+        border-radius: 12px;
+        padding: 0.5rem;
+        margin-bottom: 1rem;
+        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.08);
+    }}"""
+    for i, color in enumerate(CARD_COLORS)
+) + """
+    /* Style the expander header (collapsed state) */
+    div[data-testid="stExpander"] div[data-testid="stExpanderHeader"] {
+        background: transparent !important;
+        color: #000000 !important;
+    }
+    /* Style the expander content (expanded state) */
+    div[data-testid="stExpander"] div[data-testid="stExpanderDetails"] {
+        background: white !important;
+        border-radius: 8px;
+    }
+</style>"""
+
+# Inline styles shared by the customer card's HTML sections
+CARD_FIELD_STYLE = "margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;"
+CARD_WARNING_STYLE = "background-color: #fffce7; border-radius: 8px; padding: 0.8rem 1rem; margin-bottom: 0.6rem;"
+CARD_INFO_STYLE = "background-color: #e8f2fc; border-radius: 8px; padding: 0.8rem 1rem; margin-bottom: 0.6rem;"
+
+# Seconds read helpers keep their results; every write clears them early
+READ_CACHE_TTL = 60
+CALCULATOR_CACHE_TTL = 300
+
+# Customers per DELETE request in the admin cleanup (keeps the IN (...) URL short)
+DELETE_BATCH_SIZE = 200
+
+# Fields the edit forms may write, and the policy fields stored as numbers
+CUSTOMER_EDIT_FIELDS = frozenset({
+    'nickname', 'phone_number', 'alt_phone_number', 'email', 'aadhaar_number',
+    'date_of_birth', 'occupation', 'full_address', 'google_maps_link', 'notes',
+})
+POLICY_EDIT_FIELDS = frozenset({
+    'agent_code', 'plan_name', 'date_of_commencement', 'payment_period', 'current_fup_date',
+    'sum_assured', 'premium_amount', 'status', 'maturity_date', 'policy_term', 'last_payment_date',
+})
+POLICY_NUMERIC_FIELDS = frozenset({'sum_assured', 'premium_amount', 'policy_term'})
+
+# Policy numbers per IN (...) lookup, and rows per bulk upsert request
+LOOKUP_BATCH_SIZE = 200
+UPSERT_BATCH_SIZE = 500
+
+@st.cache_resource
 def get_supabase_client() -> Client:
-    """Get Supabase client connection"""
+    """Get Supabase client connection (one client, and HTTP session, shared across reruns)"""
     try:
         url = st.secrets["supabase"]["url"]
         key = st.secrets["supabase"]["key"]
@@ -23,8 +141,7 @@ def validate_email(email):
     if not email:
         return True, ""  # Optional field
     
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if re.match(pattern, email):
+    if EMAIL_RE.match(email):
         return True, ""
     else:
         return False, "Invalid email format"
@@ -34,12 +151,16 @@ def validate_phone_number(phone):
     if not phone:
         return True, ""  # Optional field
     
+    # Already well-formed (the usual case) - nothing to clean. fullmatch, as
+    # '$' alone would also accept a trailing newline the cleanup strips
+    if PHONE_RE.fullmatch(phone):
+        return True, phone
+    
     # Remove all spaces and special characters except +
-    cleaned_phone = re.sub(r'[^\d+]', '', phone)
+    cleaned_phone = PHONE_CLEAN_RE.sub('', phone)
     
     # Check if it matches +91 followed by exactly 10 digits
-    pattern = r'^\+91\d{10}$'
-    if re.match(pattern, cleaned_phone):
+    if PHONE_RE.match(cleaned_phone):
         return True, cleaned_phone
     else:
         return False, "Phone number must be in format +91XXXXXXXXXX (10 digits after +91)"
@@ -49,14 +170,24 @@ def validate_aadhaar(aadhaar):
     if not aadhaar:
         return True, ""  # Optional field
     
+    # Already 12 digits - nothing to clean (isdecimal() is exactly regex \d)
+    if len(aadhaar) == 12 and aadhaar.isdecimal():
+        return True, aadhaar
+    
     # Remove all spaces and special characters
-    cleaned_aadhaar = re.sub(r'[^\d]', '', aadhaar)
+    cleaned_aadhaar = NON_DIGIT_RE.sub('', aadhaar)
     
-    if len(cleaned_aadhaar) == 12 and cleaned_aadhaar.isdigit():
+    # Only digits are left after the substitution, so the length is enough
+    if len(cleaned_aadhaar) == 12:
         return True, cleaned_aadhaar
     else:
         return False, "Aadhaar number must be exactly 12 digits"
 
+@lru_cache(maxsize=2048)
+def parse_dob_string(dob):
+    """Parse a YYYY-MM-DD date of birth (memoized; forms re-validate the same value each rerun)"""
+    return datetime.strptime(dob, '%Y-%m-%d').date()
+
 def validate_date_of_birth(dob):
     """Validate date of birth (should not be in future and reasonable age)"""
     if not dob:
@@ -64,7 +195,7 @@ def validate_date_of_birth(dob):
     
     if isinstance(dob, str):
         try:
-            dob = datetime.strptime(dob, '%Y-%m-%d').date()
+            dob = parse_dob_string(dob)
         except:
             return False, "Invalid date format"
     
@@ -102,162 +233,89 @@ def check_database_exists():
     except Exception as e:
         return False, f"Error: {str(e)}"
 
-def get_database_connection():
-    """Get Supabase client connection"""
-    try:
-        supabase = get_supabase_client()
-        return supabase
-    except Exception as e:
-        st.error(f"❌ Could not connect to Supabase: {e}")
-        return None
-
 def find_potential_duplicates(customers):
     """Find potential duplicate customers based on multiple identifiers"""
-    potential_duplicates = []
-    
-    for i, customer1 in enumerate(customers):
-        for j, customer2 in enumerate(customers[i+1:], i+1):
-            match_reasons = []
-            
-            # Check for exact name match (case insensitive)
-            name1 = (customer1.get('customer_name') or '').strip().lower()
-            name2 = (customer2.get('customer_name') or '').strip().lower()
-            
-            if name1 and name2 and name1 == name2:
-                match_reasons.append("Same name")
-            
-            # Check for phone number match
-            phone1 = (customer1.get('phone_number') or '').strip()
-            phone2 = (customer2.get('phone_number') or '').strip()
-            
-            if phone1 and phone2 and phone1 == phone2:
-                match_reasons.append("Same phone")
-            
-            # Check for Aadhaar match
-            aadhaar1 = (customer1.get('aadhaar_number') or '').strip()
-            aadhaar2 = (customer2.get('aadhaar_number') or '').strip()
-            
-            if aadhaar1 and aadhaar2 and aadhaar1 == aadhaar2:
-                match_reasons.append("Same Aadhaar")
-            
-            # Check for DOB match
-            dob1 = (customer1.get('date_of_birth') or '').strip()
-            dob2 = (customer2.get('date_of_birth') or '').strip()
-            
-            if dob1 and dob2 and dob1 == dob2:
-                match_reasons.append("Same DOB")
-            
-            # If we have at least 2 matching criteria, consider them potential duplicates
-            if len(match_reasons) >= 2:
-                potential_duplicates.append({
-                    'customer1': customer1,
-                    'customer2': customer2,
-                    'match_reasons': match_reasons
-                })
-    
-    return potential_duplicates
+    # Bucket customers by each identifier; only customers sharing a bucket are
+    # compared, instead of every pair against every other
+    match_reasons_by_pair = defaultdict(list)
+    for field, reason in DUPLICATE_MATCH_FIELDS:
+        buckets = defaultdict(list)
+        for index, customer in enumerate(customers):
+            value = (customer.get(field) or '').strip()
+            if field == 'customer_name':
+                value = value.lower()  # Name match is case insensitive
+            if value:
+                buckets[value].append(index)
+        
+        for indices in buckets.values():
+            for pair in combinations(indices, 2):
+                match_reasons_by_pair[pair].append(reason)
+    
+    # If we have at least 2 matching criteria, consider them potential duplicates
+    return [
+        {
+            'customer1': customers[i],
+            'customer2': customers[j],
+            'match_reasons': match_reasons
+        }
+        for (i, j), match_reasons in sorted(match_reasons_by_pair.items())
+        if len(match_reasons) >= 2
+    ]
 
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
 def search_customers(query=""):
     """Search customers in the database with duplicate detection - searches by name, phone, address, aadhaar, policy number, and premium amount"""
-    supabase = get_database_connection()
-    if not supabase:
-        return [], 0
+    supabase = get_supabase_client()
     
     try:
         if query:
-            # First, search in customers table by name, phone, email, aadhaar, nickname, address
-            response = supabase.table('customers').select(
-                '*, policies(*, premium_records(*))'
-            ).or_(
-                f'customer_name.ilike.%{query}%,'
-                f'phone_number.ilike.%{query}%,'
-                f'alt_phone_number.ilike.%{query}%,'
-                f'email.ilike.%{query}%,'
-                f'aadhaar_number.ilike.%{query}%,'
-                f'nickname.ilike.%{query}%,'
-                f'full_address.ilike.%{query}%'
-            ).order('customer_name').execute()
-            
-            customers_dict = {}
-            if response.data:
-                for customer in response.data:
-                    customers_dict[customer['customer_id']] = customer
-            
-            # Also search in policies table for policy number, agent code, and premium amount
+            # First find the customers behind matching policies (policy number,
+            # agent code, or premium amount) - a light query returning only IDs
+            customer_ids_from_policies = set()
             try:
+                # Search policies by policy number or agent code
+                policy_search_filter = f'policy_number.ilike.%{query}%,agent_code.ilike.%{query}%'
+                
                 # Try to parse query as a number for premium search
-                query_as_number = None
                 try:
                     query_as_number = float(query.replace(',', '').replace('₹', '').strip())
                 except:
-                    pass
-                
-                # Search policies by policy number or agent code
-                policy_search_filter = f'policy_number.ilike.%{query}%,agent_code.ilike.%{query}%'
+                    query_as_number = None
                 
                 # Add premium amount search if query is a number
                 if query_as_number is not None:
                     # Search for premiums within ±10% of the query amount (rounded search)
                     min_premium = query_as_number * 0.9
                     max_premium = query_as_number * 1.1
-                    
-                    # Get policies matching policy number/agent code
-                    policy_response = supabase.table('policies').select(
-                        'customer_id, policy_number, premium_amount, agent_code, premium_records(*)'
-                    ).or_(policy_search_filter).execute()
-                    
-                    # Also get policies with matching premium amounts
-                    premium_response = supabase.table('policies').select(
-                        'customer_id, policy_number, premium_amount, agent_code, premium_records(*)'
-                    ).gte('premium_amount', min_premium).lte('premium_amount', max_premium).execute()
-                    
-                    # Combine results
-                    all_policies = []
-                    if policy_response.data:
-                        all_policies.extend(policy_response.data)
-                    if premium_response.data:
-                        # Add premium matches, avoiding duplicates
-                        existing_policy_numbers = {p['policy_number'] for p in all_policies}
-                        for p in premium_response.data:
-                            if p['policy_number'] not in existing_policy_numbers:
-                                all_policies.append(p)
-                else:
-                    # Just search by policy number and agent code
-                    policy_response = supabase.table('policies').select(
-                        'customer_id, policy_number, premium_amount, agent_code, premium_records(*)'
-                    ).or_(policy_search_filter).execute()
-                    all_policies = policy_response.data if policy_response.data else []
-                
-                # Get customer IDs from matching policies
-                customer_ids_from_policies = set()
-                for policy in all_policies:
-                    customer_id = policy.get('customer_id')
-                    if customer_id:
-                        customer_ids_from_policies.add(customer_id)
+                    policy_search_filter += f',and(premium_amount.gte.{min_premium},premium_amount.lte.{max_premium})'
                 
-                # Fetch customers for these policy matches if not already in results
-                if customer_ids_from_policies:
-                    missing_customer_ids = customer_ids_from_policies - set(customers_dict.keys())
-                    if missing_customer_ids:
-                        missing_customers_response = supabase.table('customers').select(
-                            '*, policies(*, premium_records(*))'
-                        ).in_('customer_id', list(missing_customer_ids)).execute()
-                        
-                        if missing_customers_response.data:
-                            for customer in missing_customers_response.data:
-                                customers_dict[customer['customer_id']] = customer
-            
+                policy_response = supabase.table('policies').select('customer_id').or_(policy_search_filter).execute()
+                customer_ids_from_policies = {
+                    policy['customer_id'] for policy in (policy_response.data or []) if policy.get('customer_id')
+                }
             except Exception as e:
                 # If policy search fails, just continue with customer results
                 pass
             
-            # Convert dict back to list
-            customers = list(customers_dict.values())
+            # Then one customers query covering name, phone, email, aadhaar,
+            # nickname, address and the customers found through their policies
+            customer_search_filter = (
+                f'customer_name.ilike.%{query}%,'
+                f'phone_number.ilike.%{query}%,'
+                f'alt_phone_number.ilike.%{query}%,'
+                f'email.ilike.%{query}%,'
+                f'aadhaar_number.ilike.%{query}%,'
+                f'nickname.ilike.%{query}%,'
+                f'full_address.ilike.%{query}%'
+            )
+            if customer_ids_from_policies:
+                customer_search_filter += f',customer_id.in.({",".join(str(cid) for cid in customer_ids_from_policies)})'
+            
+            response = supabase.table('customers').select(CUSTOMER_SELECT).or_(customer_search_filter).order('customer_name').execute()
+            customers = response.data if response.data else []
         else:
             # Get first 100 customers
-            response = supabase.table('customers').select(
-                '*, policies(*, premium_records(*))'
-            ).order('customer_name').limit(100).execute()
+            response = supabase.table('customers').select(CUSTOMER_SELECT).order('customer_name').limit(100).execute()
             customers = response.data if response.data else []
         
         # Process customers data
@@ -268,37 +326,34 @@ def search_customers(query=""):
             # Get policies for this customer
             policies = customer.get('policies', [])
             
-            # Process each policy to add latest premium
-            processed_policies = []
+            # Add the latest premium (by due_date) to each policy - a single
+            # max() scan rather than sorting every record
             for policy in policies:
-                premium_records = policy.get('premium_records', [])
-                if premium_records:
-                    # Sort by due_date and get the latest
-                    sorted_premiums = sorted(
-                        premium_records, 
-                        key=lambda x: x.get('due_date', ''), 
-                        reverse=True
-                    )
-                    policy['latest_premium'] = sorted_premiums[0] if sorted_premiums else None
-                else:
-                    policy['latest_premium'] = None
-                processed_policies.append(policy)
+                policy['latest_premium'] = max(
+                    policy.get('premium_records') or [],
+                    key=lambda x: x.get('due_date') or '',
+                    default=None
+                )
             
-            customer['policies'] = processed_policies
-            total_policies += len(processed_policies)
+            customer['policies'] = policies
+            total_policies += len(policies)
             customers_with_policies.append(customer)
         
         # Check for potential duplicates
         if customers_with_policies:
             potential_duplicates = find_potential_duplicates(customers_with_policies)
             
-            # Add duplicate information to customers
+            # Add duplicate information to customers in one pass over the pairs
+            duplicates_by_customer = {customer['customer_id']: [] for customer in customers_with_policies}
+            for dup in potential_duplicates:
+                customer1_id = dup['customer1']['customer_id']
+                customer2_id = dup['customer2']['customer_id']
+                duplicates_by_customer[customer1_id].append(dup)
+                if customer2_id != customer1_id:
+                    duplicates_by_customer[customer2_id].append(dup)
+
             for customer in customers_with_policies:
-                customer['potential_duplicates'] = []
-                for dup in potential_duplicates:
-                    if (dup['customer1']['customer_id'] == customer['customer_id'] or 
-                        dup['customer2']['customer_id'] == customer['customer_id']):
-                        customer['potential_duplicates'].append(dup)
+                customer['potential_duplicates'] = duplicates_by_customer[customer['customer_id']]
         
         return customers_with_policies, total_policies
         
@@ -306,11 +361,18 @@ def search_customers(query=""):
         st.error(f"❌ Database query error: {e}")
         return [], 0
 
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
 def get_all_addresses():
     """Get all unique addresses from the database"""
     try:
         supabase = get_supabase_client()
         
+        # Let Postgres do the DISTINCT and the sort (see supabase_schema.sql)
+        try:
+            return [row['full_address'] for row in supabase.rpc('distinct_addresses').execute().data]
+        except Exception:
+            pass  # distinct_addresses() not installed yet - dedupe here instead
+        
         # Get all customers with addresses
         response = supabase.table('customers').select('full_address').execute()
         
@@ -325,6 +387,24 @@ def get_all_addresses():
         st.error(f"❌ Error fetching addresses: {e}")
         return []
 
+def parse_fup_date(fup):
+    """Parse a stored FUP date; missing or unreadable dates sort last (datetime.min)"""
+    if not fup:
+        return datetime.min
+    # Most dates are stored as ISO YYYY-MM-DD - take the C fast path first
+    if len(fup) == 10:
+        try:
+            return datetime.fromisoformat(fup)
+        except ValueError:
+            pass
+    for fmt in FUP_DATE_FORMATS:
+        try:
+            return datetime.strptime(fup, fmt)
+        except ValueError:
+            continue
+    return datetime.min
+
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
 def get_policies_by_address(address):
     """Get all policies for customers at a specific address, sorted by FUP date"""
     try:
@@ -338,13 +418,16 @@ def get_policies_by_address(address):
         if not customers_response.data:
             return []
         
-        customer_ids = [c['customer_id'] for c in customers_response.data]
+        # One pass builds the lookup; its keys are the IDs for the IN query
         customer_map = {c['customer_id']: c for c in customers_response.data}
+        customer_ids = list(customer_map)
         
         # Get all policies for these customers
+        # Postgres returns the rows newest-first, so the Python sort below only
+        # has to fix up dates stored in non-ISO layouts
         policies_response = supabase.table('policies').select(
             'policy_number, customer_id, premium_amount, current_fup_date'
-        ).in_('customer_id', customer_ids).execute()
+        ).in_('customer_id', customer_ids).order('current_fup_date', desc=True, nullsfirst=False).execute()
         
         # Combine customer and policy data
         policy_list = []
@@ -359,26 +442,9 @@ def get_policies_by_address(address):
                     'fup_date': policy.get('current_fup_date'),
                 })
         
-        # Sort by FUP date (most recent first)
-        # Handle None values and parse dates
-        from datetime import datetime
-        
-        def parse_fup_date(policy):
-            fup = policy.get('fup_date')
-            if not fup:
-                return datetime.min
-            try:
-                # Try different date formats
-                for fmt in ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d-%m-%y']:
-                    try:
-                        return datetime.strptime(fup, fmt)
-                    except:
-                        continue
-                return datetime.min
-            except:
-                return datetime.min
-        
-        policy_list.sort(key=parse_fup_date, reverse=True)
+        # Sort by FUP date (most recent first); sort() computes each key once,
+        # and Timsort is near-linear on the mostly-ordered rows
+        policy_list.sort(key=lambda policy: parse_fup_date(policy.get('fup_date')), reverse=True)
         
         return policy_list
         
@@ -396,20 +462,28 @@ def is_sunday_or_holiday(check_date):
     Returns:
         bool: True if Sunday or holiday
     """
-    # Check if Sunday (weekday() returns 6 for Sunday)
-    if check_date.weekday() == 6:
-        return True
-    
-    # Indian National Holidays (2025-2026)
-    # Format: (month, day)
-    indian_holidays = [
-        (1, 26),   # Republic Day
-        (8, 15),   # Independence Day
-        (10, 2),   # Gandhi Jayanti
-        # Add other major holidays as needed
-    ]
-    
-    return (check_date.month, check_date.day) in indian_holidays
+    # Sunday (weekday() returns 6 for Sunday) or a national holiday
+    return check_date.weekday() == 6 or (check_date.month, check_date.day) in INDIAN_HOLIDAYS
+
+def add_months(d, months, day=None):
+    """Shift a date by whole months (optionally onto a given day), clamping to
+    the month's last day - the same result as d + relativedelta(months=months, day=day)"""
+    year, month_index = divmod(d.month - 1 + months, 12)
+    year += d.year
+    month = month_index + 1
+    return d.replace(year=year, month=month, day=min(day or d.day, calendar.monthrange(year, month)[1]))
+
+def months_between(start, end):
+    """Whole months from start to end - same as relativedelta(end, start)'s years*12 + months,
+    with plain integer arithmetic instead of building relativedelta objects"""
+    months = (end.year - start.year) * 12 + (end.month - start.month)
+    # Step back (or forward, for end < start) if the month-shifted start overshoots end
+    if end >= start:
+        if end < add_months(start, months):
+            months -= 1
+    elif end > add_months(start, months):
+        months += 1
+    return months
 
 def get_premium_fine_details(due_date, today_date, payment_mode, modal_premium, commencement_date=None, last_premium_paid_date=None):
     """
@@ -456,9 +530,6 @@ def get_premium_fine_details(due_date, today_date, payment_mode, modal_premium,
     
     if commencement_date and payment_mode != 'Monthly':
         # For non-monthly, calculate each missed due separately
-        due_day = commencement_date.day
-        current_due = calculation_base_date
-        
         # Get payment interval in months
         if payment_mode == 'Quarterly':
             interval_months = 3
@@ -467,46 +538,52 @@ def get_premium_fine_details(due_date, today_date, payment_mode, modal_premium,
         else:  # Yearly
             interval_months = 12
         
-        # Find all dues from calculation_base_date to today
-        while current_due <= today_date:
-            # Calculate grace end date for this due
-            grace_end = current_due + relativedelta(days=29)
-            
-            # Check if this due has passed its grace period
-            if today_date > grace_end:
-                # Calculate months from this due date to today
-                time_from_due = relativedelta(today_date, current_due)
-                months_from_due = time_from_due.months + (time_from_due.years * 12)
-                
-                # Calculate fine for this due
-                due_fine = modal_premium * fine_rate * months_from_due
-                
-                dues_breakdown.append({
-                    'due_date': current_due,
-                    'grace_end': grace_end,
-                    'months_late': months_from_due,
-                    'fine': due_fine,
-                    'premium': modal_premium
-                })
-            
-            # Move to next due date
-            current_due = current_due + relativedelta(months=interval_months)
+        # A due is fined once today is past its 29-day grace, i.e. it falls
+        # before grace_cutoff. Dues only move forward, so stop at the first
+        # one that doesn't instead of walking on to today.
+        grace_cutoff = today_date - timedelta(days=29)
+        base_month_index = calculation_base_date.year * 12 + calculation_base_date.month - 1
+        today_month_index = today_date.year * 12 + today_date.month - 1
+        today_month_days = calendar.monthrange(today_date.year, today_date.month)[1]
+        due_day = calculation_base_date.day
+        
+        # Dues step interval_months at a time from the base date; like repeated
+        # month additions, the day clamps at each short month and stays there
+        for month_index in range(base_month_index, today_month_index + 1, interval_months):
+            year, month = divmod(month_index, 12)
+            due_day = min(due_day, calendar.monthrange(year, month + 1)[1])
+            current_due = date(year, month + 1, due_day)
+            if current_due >= grace_cutoff:
+                break
+            
+            # Whole months from this due date to today (same as months_between:
+            # a month is complete once today reaches the due day, clamped to
+            # the length of today's month)
+            months_from_due = today_month_index - month_index - (today_date.day < min(due_day, today_month_days))
+            
+            dues_breakdown.append({
+                'due_date': current_due,
+                'grace_end': current_due + timedelta(days=29),
+                'months_late': months_from_due,
+                'fine': modal_premium * fine_rate * months_from_due,
+                'premium': modal_premium
+            })
     
     # Step 5: Calculate pending months/payments
     months_pending = 0
     
     if last_premium_paid_date:
         # Calculate how many payment periods have passed since last payment
-        time_diff = relativedelta(today_date, last_premium_paid_date)
+        months_since_payment = months_between(last_premium_paid_date, today_date)
         
         if payment_mode == 'Monthly':
-            months_pending = time_diff.months + (time_diff.years * 12)
+            months_pending = months_since_payment
         elif payment_mode == 'Quarterly':
-            months_pending = (time_diff.months + (time_diff.years * 12)) // 3
+            months_pending = months_since_payment // 3
         elif payment_mode == 'HalfYearly':
-            months_pending = (time_diff.months + (time_diff.years * 12)) // 6
+            months_pending = months_since_payment // 6
         elif payment_mode == 'Yearly':
-            months_pending = time_diff.years
+            months_pending = int(months_since_payment / 12)  # Whole years, truncated like relativedelta
     
     # Step 6: Calculate next due dates if commencement_date is provided
     next_due_dates = []
@@ -518,13 +595,13 @@ def get_premium_fine_details(due_date, today_date, payment_mode, modal_premium,
         current_date = today_date
         for i in range(3):  # Show next 3 due dates
             if payment_mode == 'Monthly':
-                next_due = current_date + relativedelta(months=i+1, day=due_day)
+                next_due = add_months(current_date, i+1, day=due_day)
             elif payment_mode == 'Quarterly':
-                next_due = current_date + relativedelta(months=(i+1)*3, day=due_day)
+                next_due = add_months(current_date, (i+1)*3, day=due_day)
             elif payment_mode == 'HalfYearly':
-                next_due = current_date + relativedelta(months=(i+1)*6, day=due_day)
+                next_due = add_months(current_date, (i+1)*6, day=due_day)
             else:  # Yearly
-                next_due = current_date + relativedelta(years=i+1, day=due_day)
+                next_due = add_months(current_date, (i+1)*12, day=due_day)
             next_due_dates.append(next_due)
     
     # Step 7: Check Policy Status and Calculate Fine
@@ -536,7 +613,7 @@ def get_premium_fine_details(due_date, today_date, payment_mode, modal_premium,
         total_premium = sum(due['premium'] for due in dues_breakdown)
         
         # Check if lapsed
-        lapse_threshold = calculation_base_date + relativedelta(months=5, days=29)
+        lapse_threshold = add_months(calculation_base_date, 5) + timedelta(days=29)
         
         if today_date >= lapse_threshold:
             policy_status = 'Pakka Lapse'
@@ -584,12 +661,11 @@ def get_premium_fine_details(due_date, today_date, payment_mode, modal_premium,
     
     # Case 2: Lapsed ("Pakka Lapse")
     # Check if today_date is at least 5 months and 29 days past the calculation_base_date
-    # Using relativedelta to accurately calculate the time difference
-    lapse_threshold = calculation_base_date + relativedelta(months=5, days=29)
+    # Month arithmetic clamps to month ends exactly like relativedelta
+    lapse_threshold = add_months(calculation_base_date, 5) + timedelta(days=29)
     
     # Calculate the number of months from base date for fine calculation
-    time_diff = relativedelta(today_date, calculation_base_date)
-    months_from_base = time_diff.months + (time_diff.years * 12)
+    months_from_base = months_between(calculation_base_date, today_date)
     
     # For monthly: Use actual months from base date
     months_for_fine = months_from_base
@@ -620,6 +696,53 @@ def get_premium_fine_details(due_date, today_date, payment_mode, modal_premium,
         'dues_breakdown': []
     }
 
+def get_premium_fines_bulk(df):
+    """
+    Vectorized get_premium_fine_details for many policies at once (the path
+    without a commencement date: one fine per policy, no dues breakdown).
+    
+    Args:
+        df (pd.DataFrame): Columns due_date, today, last_paid (datetime64, last_paid may be NaT),
+                           payment_mode (str) and modal_premium (float)
+    
+    Returns:
+        pd.DataFrame: df with calculation_base_date, days_late, fine and policy_status added
+    """
+    df = df.copy()
+    
+    # Base date is whichever is latest: FUP date or last premium paid date
+    base = df['last_paid'].where(df['last_paid'] > df['due_date'], df['due_date'])
+    today = df['today']
+    df['calculation_base_date'] = base
+    df['days_late'] = (today - base).dt.days
+    
+    # Monthly: 15 days grace, 5% per month. Others: 29 days grace, 0.9% per month
+    is_monthly = df['payment_mode'] == 'Monthly'
+    grace_period = is_monthly.map({True: 15, False: 29})
+    fine_rate = is_monthly.map({True: 0.05, False: 0.009})
+    
+    # Whole months from base to today (months_between, valid once today >= base,
+    # which is every row that isn't in grace)
+    months_for_fine = (
+        (today.dt.year - base.dt.year) * 12 + (today.dt.month - base.dt.month)
+        - (today.dt.day < base.dt.day.clip(upper=today.dt.days_in_month)).astype(int)
+    )
+    
+    # Lapsed once today is 5 months and 29 days past the base date
+    # (DateOffset clamps to month ends like add_months)
+    lapse_threshold = base + pd.DateOffset(months=5) + pd.Timedelta(days=29)
+    
+    in_grace = df['days_late'] <= grace_period
+    lapsed = ~in_grace & (today >= lapse_threshold)
+    
+    df['fine'] = (df['modal_premium'] * fine_rate * months_for_fine).mask(in_grace, 0.0)
+    df['policy_status'] = 'Late'
+    df.loc[in_grace, 'policy_status'] = 'In Grace'
+    df.loc[lapsed, 'policy_status'] = 'Pakka Lapse'
+    
+    return df
+
+@lru_cache(maxsize=4096)
 def normalize_payment_mode(payment_mode):
     """
     Normalize payment mode from database to match selectbox options
@@ -633,26 +756,12 @@ def normalize_payment_mode(payment_mode):
     if not payment_mode:
         return 'Monthly'
     
-    # Convert to lowercase and remove spaces/hyphens for comparison
-    mode_lower = str(payment_mode).lower().strip().replace(' ', '').replace('-', '')
-    
-    # Map various formats to standard format
-    if mode_lower in ['monthly', 'month', 'm']:
-        return 'Monthly'
-    elif mode_lower in ['quarterly', 'quarter', 'q', '3months']:
-        return 'Quarterly'
-    elif mode_lower in ['halfyearly', 'semiannual', 'h', '6months']:
-        return 'HalfYearly'
-    elif mode_lower in ['yearly', 'annual', 'annually', 'year', 'y', '12months']:
-        return 'Yearly'
-    
-    # If exact match found, return as-is
-    if payment_mode in ['Monthly', 'Quarterly', 'HalfYearly', 'Yearly']:
-        return payment_mode
-    
-    # Default to Monthly if can't match
-    return 'Monthly'
+    # Convert to lowercase and remove spaces/hyphens, then one dict lookup;
+    # anything unrecognised defaults to Monthly
+    mode_key = str(payment_mode).lower().strip().replace(' ', '').replace('-', '')
+    return PAYMENT_MODE_MAP.get(mode_key, 'Monthly')
 
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
 def search_policies_by_number(partial_policy_number):
     """
     Search for policies matching the partial policy number
@@ -669,28 +778,22 @@ def search_policies_by_number(partial_policy_number):
         
         supabase = get_supabase_client()
         
-        # Search for policies starting with the partial number
+        # Search for policies starting with the partial number; the customer
+        # name comes along via the customer_id foreign key (one request, not two).
+        # Policy numbers are digits, so a case-sensitive LIKE matches the same
+        # rows and can use the text_pattern_ops index for the prefix.
         policy_response = supabase.table('policies').select(
-            'policy_number, customer_id, payment_period, premium_amount, '
-            'date_of_commencement, current_fup_date'
-        ).ilike('policy_number', f'{partial_policy_number}%').limit(20).execute()
+            'policy_number, payment_period, premium_amount, '
+            'date_of_commencement, current_fup_date, customers(customer_name)'
+        ).like('policy_number', f'{partial_policy_number}%').limit(20).execute()
         
         if not policy_response.data:
             return []
         
-        # Get customer names for matching policies
-        customer_ids = [p['customer_id'] for p in policy_response.data]
-        customer_response = supabase.table('customers').select(
-            'customer_id, customer_name'
-        ).in_('customer_id', customer_ids).execute()
-        
-        # Create a mapping of customer_id to customer_name
-        customer_map = {c['customer_id']: c['customer_name'] for c in customer_response.data}
-        
         # Build results list with display format: "PolicyNumber - CustomerName"
         results = []
         for policy in policy_response.data:
-            customer_name = customer_map.get(policy['customer_id'], 'Unknown')
+            customer_name = (policy.get('customers') or {}).get('customer_name') or 'Unknown'
             display_text = f"{policy['policy_number']} - {customer_name}"
             
             policy_data = {
@@ -710,6 +813,7 @@ def search_policies_by_number(partial_policy_number):
         st.error(f"❌ Error searching policies: {e}")
         return []
 
+@st.cache_data(ttl=CALCULATOR_CACHE_TTL, show_spinner=False)
 def get_policy_details_for_calculator(policy_number):
     """
     Fetch policy details from database for premium calculator
@@ -723,23 +827,18 @@ def get_policy_details_for_calculator(policy_number):
     try:
         supabase = get_supabase_client()
         
-        # Get policy details
+        # Get policy details, with the customer name embedded through the
+        # customer_id foreign key (one request instead of two)
         policy_response = supabase.table('policies').select(
-            'policy_number, customer_id, payment_period, premium_amount, '
-            'date_of_commencement, current_fup_date'
+            'policy_number, payment_period, premium_amount, '
+            'date_of_commencement, current_fup_date, customers(customer_name)'
         ).eq('policy_number', policy_number).execute()
         
         if not policy_response.data:
             return None
         
         policy = policy_response.data[0]
-        
-        # Get customer details to potentially get last payment info
-        customer_response = supabase.table('customers').select(
-            'customer_name'
-        ).eq('customer_id', policy['customer_id']).execute()
-        
-        customer_name = customer_response.data[0]['customer_name'] if customer_response.data else 'Unknown'
+        customer_name = (policy.get('customers') or {}).get('customer_name') or 'Unknown'
         
         return {
             'policy_number': policy['policy_number'],
@@ -754,23 +853,145 @@ def get_policy_details_for_calculator(policy_number):
         st.error(f"❌ Error fetching policy details: {e}")
         return None
 
-def display_customer_card(customer, card_index=0):
-    """Display a customer card with collapsible details"""
-    # Color palette for distinguishing customer cards
-    colors = [
-        '#E8F4FD',  # Light blue
-        '#FFF4E6',  # Light orange
-        '#E8F8F5',  # Light green
-        '#F4E8FD',  # Light purple
-        '#FDE8F4',  # Light pink
-        '#FFFACD',  # Light yellow
-        '#E0F2F1',  # Light teal
-        '#FFF0F5',  # Light lavender
-    ]
+def render_customer_html(customer):
+    """Build the HTML for a customer card's details, maps link and notes sections"""
+    # 3-column grid of the customer's fields, white background
+    html = f"""
+        <div style='background-color: #ffffff; 
+                    padding: 1rem; border-radius: 12px; margin-bottom: 0.8rem;
+                    border: 1px solid #e0e0e0;
+                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+                    display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 0 1rem;'>
+            <div>
+                <p style='{CARD_FIELD_STYLE}'>🏷️ <strong style='color: #000000;'>Nickname:</strong> {customer.get('nickname') or 'N/A'}</p>
+                <p style='{CARD_FIELD_STYLE}'>📞 <strong style='color: #000000;'>Phone:</strong> {customer.get('phone_number') or 'N/A'}</p>
+                <p style='{CARD_FIELD_STYLE}'>📧 <strong style='color: #000000;'>Email:</strong> {customer.get('email') or 'N/A'}</p>
+            </div>
+            <div>
+                <p style='{CARD_FIELD_STYLE}'>💼 <strong style='color: #000000;'>Occupation:</strong> {customer.get('occupation') or 'N/A'}</p>
+                <p style='{CARD_FIELD_STYLE}'>🆔 <strong style='color: #000000;'>Aadhaar:</strong> {customer.get('aadhaar_number') or 'N/A'}</p>
+                <p style='{CARD_FIELD_STYLE}'>🎂 <strong style='color: #000000;'>DOB:</strong> {customer.get('date_of_birth') or 'N/A'}</p>
+            </div>
+            <div>
+                <p style='{CARD_FIELD_STYLE}'>📞 <strong style='color: #000000;'>Alt Phone:</strong> {customer.get('alt_phone_number') or 'N/A'}</p>
+                <p style='{CARD_FIELD_STYLE}'>🏠 <strong style='color: #000000;'>Address:</strong> {customer.get('full_address') or 'N/A'}</p>
+                <p style='{CARD_FIELD_STYLE}'>🔄 <strong style='color: #000000;'>Updated:</strong> {customer.get('last_updated') or 'N/A'}</p>
+            </div>
+        </div>
+    """
+    
+    # Google Maps link in separate section with white background (if available)
+    if customer.get('google_maps_link'):
+        html += f"""
+        <div style='background-color: #ffffff; 
+                    padding: 1rem; border-radius: 12px; margin-bottom: 0.8rem;
+                    border: 1px solid #e0e0e0;
+                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
+            <p style='color: #000000;'><a href='{customer.get('google_maps_link')}' style='color: #0066cc;'>📍 Open in Google Maps</a></p>
+        </div>
+    """
+    
+    # Notes (if any)
+    if customer.get('notes'):
+        html += f"""
+        <div style='background-color: #fffef0; 
+                    padding: 1rem; border-radius: 12px; margin-bottom: 0.8rem;
+                    border: 1px solid #f0e68c;
+                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
+            <p style='color: #000000;'>📝 <strong style='color: #000000;'>Notes:</strong> {customer.get('notes')}</p>
+        </div>
+    """
+    
+    return html
+
+def render_policy_html(policy):
+    """Build the HTML for a policy's basic, dates and financial sections (display mode)"""
+    # Dates: fall back to the latest premium record, or note Premium Due only
+    commencement = policy.get('date_of_commencement', 'N/A')
+    if commencement and commencement != 'N/A' and str(commencement).strip():
+        commencement_html = f"🗓️ <strong>Commencement:</strong> {commencement}"
+    else:
+        commencement_html = "🗓️ <strong>Commencement:</strong> 📄 <em>Premium Due only</em>"
     
-    # Get color for this card (cycle through colors)
-    card_color = colors[card_index % len(colors)]
+    fup_date = policy.get('current_fup_date', 'N/A')
+    if fup_date and fup_date != 'N/A' and str(fup_date).strip():
+        fup_html = f"📅 <strong>FUP (Next Due):</strong> {fup_date}"
+    elif policy.get('latest_premium') and policy['latest_premium'].get('due_date'):
+        fup_html = f"📅 <strong>Latest Due:</strong> {policy['latest_premium']['due_date']}"
+    else:
+        fup_html = "📅 <strong>FUP:</strong> 💳 <em>Premium Due only</em>"
     
+    last_payment = policy.get('last_payment_date', 'N/A')
+    if last_payment and last_payment != 'N/A' and str(last_payment).strip():
+        last_payment_html = f"💳 <strong>Last Payment:</strong> {last_payment}"
+    else:
+        last_payment_html = "💳 <strong>Last Payment:</strong> Not recorded"
+    
+    # Financials, with the due count shown prominently if available
+    premium_amount = policy.get('premium_amount')
+    premium_text = f"₹{premium_amount:,.2f}" if premium_amount else "Not Available"
+    sum_assured = policy.get('sum_assured')
+    sum_assured_text = f"₹{sum_assured:,.2f}" if sum_assured else "Not Available"
+    
+    due_count_html = ""
+    if policy.get('latest_premium') and policy['latest_premium'].get('due_count'):
+        due_count = policy['latest_premium']['due_count']
+        if due_count > 1:
+            due_count_html = f"<div style='{CARD_WARNING_STYLE}'>⚠️ <strong>{due_count} Premiums Due</strong></div>"
+        else:
+            due_count_html = f"<div style='{CARD_INFO_STYLE}'>ℹ️ <strong>{due_count} Premium Due</strong></div>"
+    
+    return f"""
+        <div style='background-color: #e8f4fd; 
+                    padding: 0.8rem; border-radius: 10px; margin-bottom: 0.6rem;
+                    border: 1px solid #b3d9f2;
+                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+                    display: grid; grid-template-columns: 1fr 1fr; gap: 0 1rem;'>
+            <div>
+                <p style='color: #000000; margin: 0;'>📝 <strong style='color: #000000;'>Plan Name:</strong> {policy.get('plan_name', 'N/A')}</p>
+                <p style='color: #000000; margin: 0;'>🏢 <strong style='color: #000000;'>Agent Code:</strong> {policy.get('agent_code', 'N/A')}</p>
+            </div>
+            <div>
+                <p style='color: #000000; margin: 0;'>📆 <strong style='color: #000000;'>Payment Term:</strong> {policy.get('payment_period', 'N/A')}</p>
+            </div>
+        </div>
+        <div style='background-color: #fef5e7; 
+                    padding: 0.8rem; border-radius: 10px; margin-bottom: 0.6rem;
+                    border: 1px solid #f9e79f;
+                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+                    display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 0 1rem;'>
+            <p style='{CARD_FIELD_STYLE}'>{commencement_html}</p>
+            <p style='{CARD_FIELD_STYLE}'>{fup_html}</p>
+            <p style='{CARD_FIELD_STYLE}'>{last_payment_html}</p>
+        </div>
+        <div style='display: grid; grid-template-columns: 1fr 1fr; gap: 0 1rem; align-items: start;'>
+            <div style='background-color: #e8f8f5; 
+                        padding: 0.8rem; border-radius: 10px; margin-bottom: 0.6rem;
+                        border: 1px solid #a9dfbf;
+                        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
+                <p style='{CARD_FIELD_STYLE}'>💰 <strong>Premium Amount:</strong> {premium_text}</p>
+                <p style='{CARD_FIELD_STYLE}'>🏦 <strong>Sum Assured:</strong> {sum_assured_text}</p>
+            </div>
+            <div>{due_count_html}</div>
+        </div>
+    """
+
+@st.cache_data(ttl=READ_CACHE_TTL, max_entries=500, show_spinner=False)
+def cached_customer_html(customer_id, last_updated, _customer):
+    """render_customer_html, reused across reruns until the customer's row changes
+    (the _customer argument isn't hashed - id and last_updated are the key)"""
+    return render_customer_html(_customer)
+
+@st.cache_data(ttl=READ_CACHE_TTL, max_entries=2000, show_spinner=False)
+def cached_policy_html(policy_number, last_updated, latest_premium_key, _policy):
+    """render_policy_html, reused across reruns until the policy row or its latest
+    premium record changes (the _policy argument isn't hashed)"""
+    return render_policy_html(_policy)
+
+@st.fragment
+def display_customer_card(customer, card_index=0):
+    """Display a customer card with collapsible details (a fragment: clicks that only
+    change this card rerun just the card, not the whole result list)"""
     # Determine customer name styling
     is_generic = customer['customer_name'].startswith('Customer_')
     nickname = customer.get('nickname', '')
@@ -785,32 +1006,9 @@ def display_customer_card(customer, card_index=0):
     
     # Add warning indicators
     if has_duplicates:
-        display_name = "🔄 " + display_name + " ⚠️ Duplicates"
+        display_name = f"🔄 {display_name} ⚠️ Duplicates"
     elif is_generic:
-        display_name = "⚠️ " + display_name + " (Generic)"
-    
-    # Add custom CSS for this specific expander
-    st.markdown(f"""
-        <style>
-        div[data-testid="stExpander"]:nth-of-type({card_index + 1}) {{
-            background: linear-gradient(145deg, {card_color}, #ffffff);
-            border-radius: 12px;
-            padding: 0.5rem;
-            margin-bottom: 1rem;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.08);
-        }}
-        /* Style the expander header (collapsed state) */
-        div[data-testid="stExpander"]:nth-of-type({card_index + 1}) div[data-testid="stExpanderHeader"] {{
-            background: transparent !important;
-            color: #000000 !important;
-        }}
-        /* Style the expander content (expanded state) */
-        div[data-testid="stExpander"]:nth-of-type({card_index + 1}) div[data-testid="stExpanderDetails"] {{
-            background: white !important;
-            border-radius: 8px;
-        }}
-        </style>
-    """, unsafe_allow_html=True)
+        display_name = f"⚠️ {display_name} (Generic)"
     
     # Main expandable customer section
     with st.expander(display_name, expanded=False):
@@ -846,56 +1044,11 @@ def display_customer_card(customer, card_index=0):
                         </div>
                     """, unsafe_allow_html=True)
         
-        # Customer details in compact sections with white background
-        st.markdown("""
-            <div style='background-color: #ffffff; 
-                        padding: 1rem; border-radius: 12px; margin-bottom: 0.8rem;
-                        border: 1px solid #e0e0e0;
-                        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
-        """, unsafe_allow_html=True)
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🏷️ <strong style='color: #000000;'>Nickname:</strong> {customer.get('nickname') or 'N/A'}</p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>📞 <strong style='color: #000000;'>Phone:</strong> {customer.get('phone_number') or 'N/A'}</p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>📧 <strong style='color: #000000;'>Email:</strong> {customer.get('email') or 'N/A'}</p>", unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>💼 <strong style='color: #000000;'>Occupation:</strong> {customer.get('occupation') or 'N/A'}</p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🆔 <strong style='color: #000000;'>Aadhaar:</strong> {customer.get('aadhaar_number') or 'N/A'}</p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🎂 <strong style='color: #000000;'>DOB:</strong> {customer.get('date_of_birth') or 'N/A'}</p>", unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>📞 <strong style='color: #000000;'>Alt Phone:</strong> {customer.get('alt_phone_number') or 'N/A'}</p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🏠 <strong style='color: #000000;'>Address:</strong> {customer.get('full_address') or 'N/A'}</p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🔄 <strong style='color: #000000;'>Updated:</strong> {customer.get('last_updated') or 'N/A'}</p>", unsafe_allow_html=True)
-            
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Google Maps link in separate section with white background (if available)
-        if customer.get('google_maps_link'):
-            st.markdown("""
-                <div style='background-color: #ffffff; 
-                            padding: 1rem; border-radius: 12px; margin-bottom: 0.8rem;
-                            border: 1px solid #e0e0e0;
-                            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
-            """, unsafe_allow_html=True)
-            
-            st.markdown(f"<p style='color: #000000;'><a href='{customer.get('google_maps_link')}' style='color: #0066cc;'>📍 Open in Google Maps</a></p>", unsafe_allow_html=True)
-            
-            st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Notes (if any)
-        if customer.get('notes'):
-            st.markdown("""
-                <div style='background-color: #fffef0; 
-                            padding: 1rem; border-radius: 12px; margin-bottom: 0.8rem;
-                            border: 1px solid #f0e68c;
-                            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
-            """, unsafe_allow_html=True)
-            st.markdown(f"<p style='color: #000000;'>📝 <strong style='color: #000000;'>Notes:</strong> {customer.get('notes')}</p>", unsafe_allow_html=True)
-            st.markdown("</div>", unsafe_allow_html=True)
+        # Customer details, maps link and notes - one prebuilt HTML block
+        st.markdown(
+            cached_customer_html(customer['customer_id'], customer.get('last_updated'), customer),
+            unsafe_allow_html=True
+        )
         
         # Enhanced Policies section with nested expandable - each policy is collapsible
         if customer['policies']:
@@ -915,109 +1068,39 @@ def display_customer_card(customer, card_index=0):
                     
                     with edit_col:
                         if st.button("✏️ Edit Policy", key=edit_button_key, type="secondary"):
+                            # The edit-mode check below runs in this same (fragment)
+                            # rerun, so no extra rerun is needed
                             st.session_state[edit_mode_key] = True
-                            st.rerun()
                     
                     # Check if we're in edit mode for this policy
                     if st.session_state.get(edit_mode_key, False):
                         display_policy_edit_form(policy)
                     else:
-                        # Display mode - Policy information in compact sections with white backgrounds
-                        
-                        # Basic Information Section (white background)
-                        st.markdown("""
-                            <div style='background-color: #e8f4fd; 
-                                        padding: 0.8rem; border-radius: 10px; margin-bottom: 0.6rem;
-                                        border: 1px solid #b3d9f2;
-                                        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
-                        """, unsafe_allow_html=True)
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(f"<p style='color: #000000; margin: 0;'>📝 <strong style='color: #000000;'>Plan Name:</strong> {policy.get('plan_name', 'N/A')}</p>", unsafe_allow_html=True)
-                            st.markdown(f"<p style='color: #000000; margin: 0;'>🏢 <strong style='color: #000000;'>Agent Code:</strong> {policy.get('agent_code', 'N/A')}</p>", unsafe_allow_html=True)
-                        with col2:
-                            payment_period = policy.get('payment_period', 'N/A')
-                            st.markdown(f"<p style='color: #000000; margin: 0;'>📆 <strong style='color: #000000;'>Payment Term:</strong> {payment_period}</p>", unsafe_allow_html=True)
-                        
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        
-                        # Dates Section (light yellow background)
-                        st.markdown("""
-                            <div style='background-color: #fef5e7; 
-                                        padding: 0.8rem; border-radius: 10px; margin-bottom: 0.6rem;
-                                        border: 1px solid #f9e79f;
-                                        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
-                        """, unsafe_allow_html=True)
-                        
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            commencement = policy.get('date_of_commencement', 'N/A')
-                            if commencement and commencement != 'N/A' and str(commencement).strip():
-                                st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🗓️ <strong>Commencement:</strong> {commencement}</p>", unsafe_allow_html=True)
-                            else:
-                                st.markdown("<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🗓️ <strong>Commencement:</strong> 📄 <em>Premium Due only</em></p>", unsafe_allow_html=True)
-                        
-                        with col2:
-                            fup_date = policy.get('current_fup_date', 'N/A')
-                            if fup_date and fup_date != 'N/A' and str(fup_date).strip():
-                                st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>📅 <strong>FUP (Next Due):</strong> {fup_date}</p>", unsafe_allow_html=True)
-                            else:
-                                if policy.get('latest_premium') and policy['latest_premium'].get('due_date'):
-                                    due_date = policy['latest_premium']['due_date']
-                                    st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>📅 <strong>Latest Due:</strong> {due_date}</p>", unsafe_allow_html=True)
-                                else:
-                                    st.markdown("<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>📅 <strong>FUP:</strong> 💳 <em>Premium Due only</em></p>", unsafe_allow_html=True)
-                        
-                        with col3:
-                            last_payment = policy.get('last_payment_date', 'N/A')
-                            if last_payment and last_payment != 'N/A' and str(last_payment).strip():
-                                st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>💳 <strong>Last Payment:</strong> {last_payment}</p>", unsafe_allow_html=True)
-                            else:
-                                st.markdown("<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>💳 <strong>Last Payment:</strong> Not recorded</p>", unsafe_allow_html=True)
-                        
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        
-                        # Financial Information Section (light green background)
-                        st.markdown("""
-                            <div style='background-color: #e8f8f5; 
-                                        padding: 0.8rem; border-radius: 10px; margin-bottom: 0.6rem;
-                                        border: 1px solid #a9dfbf;
-                                        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);'>
-                        """, unsafe_allow_html=True)
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            premium_amount = policy.get('premium_amount')
-                            if premium_amount:
-                                st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>💰 <strong>Premium Amount:</strong> ₹{premium_amount:,.2f}</p>", unsafe_allow_html=True)
-                            else:
-                                st.markdown("<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>💰 <strong>Premium Amount:</strong> Not Available</p>", unsafe_allow_html=True)
-                            
-                            sum_assured = policy.get('sum_assured')
-                            if sum_assured:
-                                st.markdown(f"<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🏦 <strong>Sum Assured:</strong> ₹{sum_assured:,.2f}</p>", unsafe_allow_html=True)
-                            else:
-                                st.markdown("<p style='margin: 0; padding: 2px 0; line-height: 1.4; color: #000000;'>🏦 <strong>Sum Assured:</strong> Not Available</p>", unsafe_allow_html=True)
-                        
-                        with col2:
-                            # Show due count prominently if available
-                            if policy.get('latest_premium') and policy['latest_premium'].get('due_count'):
-                                due_count = policy['latest_premium']['due_count']
-                                if due_count > 1:
-                                    st.warning(f"⚠️ **{due_count} Premiums Due**")
-                                else:
-                                    st.info(f"ℹ️ **{due_count} Premium Due**")
-                        
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        
+                        # Display mode - Policy information in compact sections, one HTML block
+                        latest_premium = policy.get('latest_premium') or {}
+                        st.markdown(
+                            cached_policy_html(
+                                policy['policy_number'], policy.get('last_updated'),
+                                (latest_premium.get('due_date'), latest_premium.get('due_count')), policy
+                            ),
+                            unsafe_allow_html=True
+                        )
+                    
                     if i < len(customer['policies']) - 1:
                         st.markdown("---")
         else:
             st.info("No policies found for this customer")
 
+def maybe_date(value):
+    """Stored date string → date for st.date_input (None when missing or 'N/A');
+    ISO dates take the stdlib fast path, anything else goes through pandas"""
+    if not value or value == 'N/A':
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return pd.to_datetime(value).date()
+
 def display_policy_edit_form(policy):
     """Display policy edit form"""
     with st.form(f"edit_policy_form_{policy['policy_number']}"):
@@ -1031,10 +1114,8 @@ def display_policy_edit_form(policy):
             plan_name = st.text_input("Plan Name", value=policy.get('plan_name', '') or '')
             agent_code = st.text_input("Agent Code", value=policy.get('agent_code', '') or '')
             payment_term = st.selectbox("Payment Term", 
-                                      options=['Yearly', 'Half-Yearly', 'Quarterly', 'Monthly', 'One-time'], 
-                                      index=0 if not policy.get('payment_period') 
-                                      else (['Yearly', 'Half-Yearly', 'Quarterly', 'Monthly', 'One-time'].index(policy.get('payment_period')) 
-                                           if policy.get('payment_period') in ['Yearly', 'Half-Yearly', 'Quarterly', 'Monthly', 'One-time'] else 0))
+                                      options=PAYMENT_TERMS, 
+                                      index=PAYMENT_TERM_INDEX.get(policy.get('payment_period'), 0))
         
         with col2:
             pass  # Empty column for now
@@ -1045,28 +1126,20 @@ def display_policy_edit_form(policy):
         
         with col1:
             commencement_date = st.date_input("Date of Commencement", 
-                                            value=None if not policy.get('date_of_commencement') 
-                                            else pd.to_datetime(policy.get('date_of_commencement')).date() 
-                                            if policy.get('date_of_commencement') != 'N/A' else None)
+                                            value=maybe_date(policy.get('date_of_commencement')))
         
         with col2:
             fup_date = st.date_input("Current FUP Date", 
-                                   value=None if not policy.get('current_fup_date') 
-                                   else pd.to_datetime(policy.get('current_fup_date')).date() 
-                                   if policy.get('current_fup_date') != 'N/A' else None)
+                                   value=maybe_date(policy.get('current_fup_date')))
         
         with col3:
             maturity_date = st.date_input("Maturity Date", 
-                                        value=None if not policy.get('maturity_date') 
-                                        else pd.to_datetime(policy.get('maturity_date')).date() 
-                                        if policy.get('maturity_date') != 'N/A' else None)
+                                        value=maybe_date(policy.get('maturity_date')))
         
         # Payment Information
         st.markdown("**Payment Information**")
         last_payment_date = st.date_input("Last Payment Date", 
-                                        value=None if not policy.get('last_payment_date') 
-                                        else pd.to_datetime(policy.get('last_payment_date')).date() 
-                                        if policy.get('last_payment_date') != 'N/A' else None,
+                                        value=maybe_date(policy.get('last_payment_date')),
                                         help="Manually update the last payment date when premium is paid")
         
         # Financial Information
@@ -1121,33 +1194,31 @@ def display_policy_edit_form(policy):
         
         if cancel_button:
             st.session_state[f"mode_edit_policy_{policy['policy_number']}"] = False
-            st.rerun()
+            st.rerun(scope="fragment")  # Back to display mode - only the card changes
 
-def update_customer_details(customer_id, updates):
-    """Update customer details in the database"""
-    supabase = get_database_connection()
-    if not supabase:
-        return False, "Database connection failed"
+def update_customer_details(customer_id, updates, now=None):
+    """Update customer details in the database (bulk callers can pass one `now` timestamp for every call)"""
+    supabase = get_supabase_client()
     
     try:
         # Build the update data
         update_data = {}
         
         for field, value in updates.items():
-            if field in ['nickname', 'phone_number', 'alt_phone_number', 'email', 'aadhaar_number', 
-                        'date_of_birth', 'occupation', 'full_address', 'google_maps_link', 'notes']:
+            if field in CUSTOMER_EDIT_FIELDS:
                 update_data[field] = value if (value and str(value).strip()) else None
         
         if not update_data:
             return False, "No valid fields to update"
         
         # Add last_updated timestamp
-        update_data['last_updated'] = datetime.now().isoformat()
+        update_data['last_updated'] = now or datetime.now().isoformat()
         
         # Update in Supabase
         response = supabase.table('customers').update(update_data).eq('customer_id', customer_id).execute()
         
         if response.data:
+            st.cache_data.clear()  # Cached searches now hold stale rows
             return True, "Customer details updated successfully"
         else:
             return False, "Customer not found"
@@ -1155,40 +1226,42 @@ def update_customer_details(customer_id, updates):
     except Exception as e:
         return False, f"Error updating customer: {str(e)}"
 
-def update_policy_details(policy_number, updates):
-    """Update policy details in the database"""
-    supabase = get_database_connection()
-    if not supabase:
-        return False, "Database connection failed"
+def coerce_policy_updates(updates):
+    """Keep only the editable policy fields, with blanks as None and numeric fields as floats"""
+    update_data = {}
+    
+    for field, value in updates.items():
+        if field in POLICY_EDIT_FIELDS:
+            if field in POLICY_NUMERIC_FIELDS:
+                # Handle numeric fields
+                try:
+                    update_data[field] = float(value) if value and str(value).strip() else None
+                except (ValueError, TypeError):
+                    update_data[field] = None
+            else:
+                update_data[field] = value if value and str(value).strip() else None
+    
+    return update_data
+
+def update_policy_details(policy_number, updates, now=None):
+    """Update policy details in the database (bulk callers can pass one `now` timestamp for every call)"""
+    supabase = get_supabase_client()
     
     try:
         # Build the update data
-        update_data = {}
-        
-        for field, value in updates.items():
-            if field in ['agent_code', 'plan_name', 
-                        'date_of_commencement', 'payment_period', 'current_fup_date', 
-                        'sum_assured', 'premium_amount', 'status', 'maturity_date', 
-                        'policy_term', 'last_payment_date']:
-                if field in ['sum_assured', 'premium_amount', 'policy_term']:
-                    # Handle numeric fields
-                    try:
-                        update_data[field] = float(value) if value and str(value).strip() else None
-                    except (ValueError, TypeError):
-                        update_data[field] = None
-                else:
-                    update_data[field] = value if value and str(value).strip() else None
+        update_data = coerce_policy_updates(updates)
         
         if not update_data:
             return False, "No valid fields to update"
         
         # Add last_updated timestamp
-        update_data['last_updated'] = datetime.now().isoformat()
+        update_data['last_updated'] = now or datetime.now().isoformat()
         
         # Update in Supabase
         response = supabase.table('policies').update(update_data).eq('policy_number', policy_number).execute()
         
         if response.data:
+            st.cache_data.clear()  # Cached searches now hold stale rows
             return True, "Policy details updated successfully"
         else:
             return False, "Policy not found"
@@ -1196,11 +1269,73 @@ def update_policy_details(policy_number, updates):
     except Exception as e:
         return False, f"Error updating policy: {str(e)}"
 
+def update_policies_bulk(policy_updates, now=None):
+    """
+    Update many policies in a few upsert requests instead of one PATCH per policy
+    
+    Args:
+        policy_updates (list): Dicts with 'policy_number' plus the fields to change
+                               (same fields and coercion as update_policy_details)
+        now (str, optional): last_updated timestamp for every row (defaults to now)
+    
+    Returns:
+        tuple: (success, message)
+    """
+    supabase = get_supabase_client()
+    
+    try:
+        now = now or datetime.now().isoformat()
+        # One row per policy (later updates to the same policy win) - a single
+        # upsert can't touch the same row twice
+        rows_by_policy = {}
+        for updates in policy_updates:
+            update_data = coerce_policy_updates(updates)
+            if update_data:
+                row = rows_by_policy.setdefault(updates['policy_number'], {'policy_number': updates['policy_number']})
+                row.update(update_data, last_updated=now)
+        
+        if not rows_by_policy:
+            return False, "No valid fields to update"
+        rows = list(rows_by_policy.values())
+        
+        # Upsert inserts unknown keys, so only send policies that already exist
+        policy_numbers = list(rows_by_policy)
+        existing_policy_numbers = set()
+        for start in range(0, len(policy_numbers), LOOKUP_BATCH_SIZE):
+            chunk = policy_numbers[start:start + LOOKUP_BATCH_SIZE]
+            response = supabase.table('policies').select('policy_number').in_('policy_number', chunk).execute()
+            existing_policy_numbers.update(policy['policy_number'] for policy in response.data)
+        
+        # A bulk upsert writes every column it's given to every row, so rows are
+        # grouped by their field set - a row never blanks a field it didn't set
+        rows_by_fields = defaultdict(list)
+        for row in rows:
+            if row['policy_number'] in existing_policy_numbers:
+                rows_by_fields[tuple(sorted(row))].append(row)
+        
+        updated = 0
+        for field_rows in rows_by_fields.values():
+            for start in range(0, len(field_rows), UPSERT_BATCH_SIZE):
+                response = supabase.table('policies').upsert(
+                    field_rows[start:start + UPSERT_BATCH_SIZE], on_conflict='policy_number'
+                ).execute()
+                updated += len(response.data or [])
+        
+        if updated:
+            st.cache_data.clear()  # Cached searches now hold stale rows
+        
+        not_found = len(rows) - sum(len(field_rows) for field_rows in rows_by_fields.values())
+        message = f"{updated} policies updated successfully"
+        if not_found:
+            message += f" ({not_found} not found)"
+        return updated > 0, message
+            
+    except Exception as e:
+        return False, f"Error updating policies: {str(e)}"
+
 def get_customer_by_id(customer_id):
     """Get customer details by ID"""
-    supabase = get_database_connection()
-    if not supabase:
-        return None
+    supabase = get_supabase_client()
     
     try:
         response = supabase.table('customers').select(
@@ -1215,24 +1350,25 @@ def get_customer_by_id(customer_id):
         st.error(f"Error fetching customer: {e}")
         return None
 
-def add_new_customer(customer_data):
-    """Add a new customer to the database"""
-    supabase = get_database_connection()
-    if not supabase:
-        return False, "Database connection failed"
+def add_new_customer(customer_data, now=None, skip_duplicate_check=False):
+    """Add a new customer to the database (bulk callers can pass one `now` timestamp for every call,
+    and skip_duplicate_check=True once they have deduplicated the batch themselves)"""
+    supabase = get_supabase_client()
     
     try:
-        # Check for potential duplicates
-        existing_customers = check_existing_customer(
-            customer_data.get('customer_name', ''),
-            customer_data.get('phone_number', ''),
-            customer_data.get('aadhaar_number', '')
-        )
-        
-        if existing_customers:
-            return False, f"Potential duplicate found: {', '.join([c['customer_name'] for c in existing_customers])}"
+        # Check for potential duplicates (one extra query per customer)
+        if not skip_duplicate_check:
+            existing_customers = check_existing_customer(
+                customer_data.get('customer_name', ''),
+                customer_data.get('phone_number', ''),
+                customer_data.get('aadhaar_number', '')
+            )
+            
+            if existing_customers:
+                return False, f"Potential duplicate found: {', '.join([c['customer_name'] for c in existing_customers])}"
         
-        # Prepare insert data
+        # Prepare insert data (created and updated share one timestamp)
+        now = now or datetime.now().isoformat()
         insert_data = {
             'customer_name': customer_data.get('customer_name'),
             'phone_number': customer_data.get('phone_number'),
@@ -1246,13 +1382,14 @@ def add_new_customer(customer_data):
             'notes': customer_data.get('notes'),
             'nickname': customer_data.get('nickname'),
             'extraction_method': 'manual',
-            'created_date': datetime.now().isoformat(),
-            'last_updated': datetime.now().isoformat()
+            'created_date': now,
+            'last_updated': now
         }
         
         response = supabase.table('customers').insert(insert_data).execute()
         
         if response.data:
+            st.cache_data.clear()  # Cached searches now hold stale rows
             customer_id = response.data[0]['customer_id']
             return True, f"Customer added successfully with ID: {customer_id}"
         else:
@@ -1263,32 +1400,66 @@ def add_new_customer(customer_data):
 
 def add_new_policy(policy_data, customer_id, document_date=None):
     """Add a new policy to the database with date update logic"""
-    supabase = get_database_connection()
-    if not supabase:
-        return False, "Database connection failed"
+    supabase = get_supabase_client()
     
     try:
+        current_date = document_date or pd.Timestamp.now().strftime('%Y-%m-%d')
+        policy_number = policy_data.get('policy_number')
+        
+        insert_data = {
+            'policy_number': policy_number,
+            'customer_id': customer_id,
+            'agent_code': policy_data.get('agent_code'),
+            'plan_name': policy_data.get('plan_name'),
+            'date_of_commencement': policy_data.get('date_of_commencement'),
+            'payment_period': policy_data.get('payment_period'),
+            'current_fup_date': policy_data.get('current_fup_date'),
+            'sum_assured': policy_data.get('sum_assured'),
+            'premium_amount': policy_data.get('premium_amount'),
+            'status': policy_data.get('status', 'Active'),
+            'maturity_date': policy_data.get('maturity_date'),
+            'policy_term': policy_data.get('policy_term'),
+            'last_payment_date': policy_data.get('last_payment_date'),
+            'extraction_method': 'manual',
+            'created_date': current_date,
+            'last_updated': current_date
+        }
+        update_data = {
+            field: value for field, value in policy_data.items()
+            if field != 'policy_number' and value
+        }
+        
+        # Single round trip: insert, or update only when this document is newer
+        if update_data and update_data.keys() <= POLICY_EDIT_FIELDS:
+            try:
+                outcome = supabase.rpc('upsert_policy_if_newer', {
+                    'p_row': insert_data, 'p_updates': update_data
+                }).execute().data
+            except Exception:
+                outcome = None  # Function not installed yet - use the two-step path
+            
+            if outcome == 'inserted':
+                st.cache_data.clear()  # Cached searches now hold stale rows
+                return True, f"Policy {policy_number} added successfully"
+            if outcome == 'updated':
+                st.cache_data.clear()  # Cached searches now hold stale rows
+                return True, f"Policy {policy_number} updated with newer information"
+            if outcome == 'stale':
+                return False, f"Policy {policy_number} already exists with newer or equal date"
+        
         # Check if policy already exists
         existing_response = supabase.table('policies').select('*').eq(
-            'policy_number', policy_data.get('policy_number')
+            'policy_number', policy_number
         ).execute()
         
         existing_policy = existing_response.data[0] if existing_response.data else None
         
-        current_date = document_date or pd.Timestamp.now().strftime('%Y-%m-%d')
-        
         if existing_policy:
             # Policy exists - check if we should update with newer information
             existing_date = existing_policy.get('last_updated') or existing_policy.get('created_date') or '1900-01-01'
             
             if current_date > existing_date:
                 # Update with newer information
-                update_data = {}
-                
-                for field, value in policy_data.items():
-                    if field != 'policy_number' and value:
-                        update_data[field] = value
-                
                 if update_data:
                     update_data['last_updated'] = current_date
                     
@@ -1297,6 +1468,7 @@ def add_new_policy(policy_data, customer_id, document_date=None):
                     ).execute()
                     
                     if response.data:
+                        st.cache_data.clear()  # Cached searches now hold stale rows
                         return True, f"Policy {policy_data['policy_number']} updated with newer information"
                     else:
                         return False, "Failed to update policy"
@@ -1306,28 +1478,10 @@ def add_new_policy(policy_data, customer_id, document_date=None):
                 return False, f"Policy {policy_data['policy_number']} already exists with newer or equal date"
         else:
             # New policy - insert
-            insert_data = {
-                'policy_number': policy_data.get('policy_number'),
-                'customer_id': customer_id,
-                'agent_code': policy_data.get('agent_code'),
-                'plan_name': policy_data.get('plan_name'),
-                'date_of_commencement': policy_data.get('date_of_commencement'),
-                'payment_period': policy_data.get('payment_period'),
-                'current_fup_date': policy_data.get('current_fup_date'),
-                'sum_assured': policy_data.get('sum_assured'),
-                'premium_amount': policy_data.get('premium_amount'),
-                'status': policy_data.get('status', 'Active'),
-                'maturity_date': policy_data.get('maturity_date'),
-                'policy_term': policy_data.get('policy_term'),
-                'last_payment_date': policy_data.get('last_payment_date'),
-                'extraction_method': 'manual',
-                'created_date': current_date,
-                'last_updated': current_date
-            }
-            
             response = supabase.table('policies').insert(insert_data).execute()
             
             if response.data:
+                st.cache_data.clear()  # Cached searches now hold stale rows
                 return True, f"Policy {policy_data['policy_number']} added successfully"
             else:
                 return False, "Failed to add policy"
@@ -1337,9 +1491,7 @@ def add_new_policy(policy_data, customer_id, document_date=None):
 
 def check_existing_customer(name, phone=None, aadhaar=None):
     """Check for existing customers with similar details"""
-    supabase = get_database_connection()
-    if not supabase:
-        return []
+    supabase = get_supabase_client()
     
     try:
         # Build query conditions
@@ -1457,10 +1609,7 @@ def show_customer_edit_form(customer_data):
 
 def show_database_stats():
     """Show database statistics"""
-    supabase = get_database_connection()
-    if not supabase:
-        st.warning("Cannot show stats - database not available")
-        return
+    supabase = get_supabase_client()
     
     try:
         # Get total counts
@@ -1688,48 +1837,47 @@ def show_manual_entry_forms():
         selected_existing_customer_id = None
         
         if customer_search_existing and search_existing_btn:
-            supabase = get_database_connection()
-            if supabase:
-                try:
-                    # Search for customers with policies
-                    response = supabase.table('customers').select(
-                        'customer_id, customer_name, phone_number, nickname, policies(policy_number)'
-                    ).or_(
-                        f'customer_name.ilike.%{customer_search_existing}%,'
-                        f'phone_number.ilike.%{customer_search_existing}%,'
-                        f'nickname.ilike.%{customer_search_existing}%'
-                    ).limit(15).execute()
-                    
-                    found_customers_existing = response.data if response.data else []
+            supabase = get_supabase_client()
+            try:
+                # Search for customers with policies
+                response = supabase.table('customers').select(
+                    'customer_id, customer_name, phone_number, nickname, policies(policy_number)'
+                ).or_(
+                    f'customer_name.ilike.%{customer_search_existing}%,'
+                    f'phone_number.ilike.%{customer_search_existing}%,'
+                    f'nickname.ilike.%{customer_search_existing}%'
+                ).limit(15).execute()
+                
+                found_customers_existing = response.data if response.data else []
+                
+                if found_customers_existing:
+                    st.markdown("**Found Customers:**")
+                    for customer in found_customers_existing:
+                        with st.container():
+                            col1, col2, col3 = st.columns([3, 1, 1])
+                            with col1:
+                                nickname_text = f" ({customer['nickname']})" if customer.get('nickname') else ""
+                                phone_text = f" - {customer['phone_number']}" if customer.get('phone_number') else ""
+                                policy_count = len(customer.get('policies', []))
+                                policy_count_text = f" [{policy_count} policies]"
+                                st.write(f"**{customer['customer_name']}**{nickname_text}{phone_text}{policy_count_text}")
+                            
+                            with col2:
+                                if st.button("Select", key=f"select_existing_{customer['customer_id']}"):
+                                    st.session_state.selected_existing_customer_id = customer['customer_id']
+                                    st.session_state.selected_existing_customer_name = customer['customer_name']
+                                    st.rerun()
+                            
+                            with col3:
+                                if st.button("👁️ View", key=f"view_existing_{customer['customer_id']}"):
+                                    st.session_state.view_customer_id = customer['customer_id']
+                            
+                            st.markdown("---")
+                else:
+                    st.warning("No customers found matching your search.")
                     
-                    if found_customers_existing:
-                        st.markdown("**Found Customers:**")
-                        for customer in found_customers_existing:
-                            with st.container():
-                                col1, col2, col3 = st.columns([3, 1, 1])
-                                with col1:
-                                    nickname_text = f" ({customer['nickname']})" if customer.get('nickname') else ""
-                                    phone_text = f" - {customer['phone_number']}" if customer.get('phone_number') else ""
-                                    policy_count = len(customer.get('policies', []))
-                                    policy_count_text = f" [{policy_count} policies]"
-                                    st.write(f"**{customer['customer_name']}**{nickname_text}{phone_text}{policy_count_text}")
-                                
-                                with col2:
-                                    if st.button("Select", key=f"select_existing_{customer['customer_id']}"):
-                                        st.session_state.selected_existing_customer_id = customer['customer_id']
-                                        st.session_state.selected_existing_customer_name = customer['customer_name']
-                                        st.rerun()
-                                
-                                with col3:
-                                    if st.button("👁️ View", key=f"view_existing_{customer['customer_id']}"):
-                                        st.session_state.view_customer_id = customer['customer_id']
-                                
-                                st.markdown("---")
-                    else:
-                        st.warning("No customers found matching your search.")
-                        
-                except Exception as e:
-                    st.error(f"Error searching customers: {e}")
+            except Exception as e:
+                st.error(f"Error searching customers: {e}")
         
         # Use session state for selected customer
         if 'selected_existing_customer_id' in st.session_state:
@@ -1739,28 +1887,27 @@ def show_manual_entry_forms():
             st.success(f"Selected Customer: **{customer_name}**")
             
             # Show existing policies for this customer
-            supabase = get_database_connection()
-            if supabase:
-                try:
-                    response = supabase.table('policies').select(
-                        'policy_number, plan_name, status, premium_amount'
-                    ).eq('customer_id', selected_existing_customer_id).order('policy_number').execute()
-                    
-                    existing_policies = response.data if response.data else []
-                    
-                    if existing_policies:
-                        st.markdown("**Existing Policies:**")
-                        for policy in existing_policies:
-                            premium_amount = policy.get('premium_amount')
-                            premium_text = f"₹{premium_amount:,.2f}" if premium_amount else "N/A"
-                            plan_name = policy.get('plan_name') or 'N/A'
-                            status = policy.get('status') or 'Active'
-                            st.write(f"• **{policy['policy_number']}** - {plan_name} - {status} - {premium_text}")
-                    else:
-                        st.info("No existing policies found for this customer.")
-                    
-                except Exception as e:
-                    st.error(f"Error fetching existing policies: {e}")
+            supabase = get_supabase_client()
+            try:
+                response = supabase.table('policies').select(
+                    'policy_number, plan_name, status, premium_amount'
+                ).eq('customer_id', selected_existing_customer_id).order('policy_number').execute()
+                
+                existing_policies = response.data if response.data else []
+                
+                if existing_policies:
+                    st.markdown("**Existing Policies:**")
+                    for policy in existing_policies:
+                        premium_amount = policy.get('premium_amount')
+                        premium_text = f"₹{premium_amount:,.2f}" if premium_amount else "N/A"
+                        plan_name = policy.get('plan_name') or 'N/A'
+                        status = policy.get('status') or 'Active'
+                        st.write(f"• **{policy['policy_number']}** - {plan_name} - {status} - {premium_text}")
+                else:
+                    st.info("No existing policies found for this customer.")
+                
+            except Exception as e:
+                st.error(f"Error fetching existing policies: {e}")
             
             st.markdown("**Step 2: Add New Policy**")
             
@@ -1772,7 +1919,7 @@ def show_manual_entry_forms():
                     new_plan_name = st.text_input("Plan Name", placeholder="e.g., 075-20, 814-15")
                     new_agent_code = st.text_input("Agent Code", placeholder="Agent code")
                     new_payment_term = st.selectbox("Payment Term", 
-                                                  options=['', 'Yearly', 'Half-Yearly', 'Quarterly', 'Monthly', 'One-time'])
+                                                  options=('',) + PAYMENT_TERMS)
                     new_premium_amount = st.number_input("Premium Amount (₹)", min_value=0.0, value=0.0)
                 
                 with col2:
@@ -1875,7 +2022,7 @@ def show_add_policy_form(customer_id, customer_name):
             new_plan_name = st.text_input("Plan Name", placeholder="e.g., 075-20, 814-15")
             new_agent_code = st.text_input("Agent Code", placeholder="Agent code")
             new_payment_term = st.selectbox("Payment Term", 
-                                          options=['', 'Yearly', 'Half-Yearly', 'Quarterly', 'Monthly', 'One-time'])
+                                          options=('',) + PAYMENT_TERMS)
             new_premium_amount = st.number_input("Premium Amount (₹)", min_value=0.0, value=0.0)
         
         with col2:
@@ -1962,73 +2109,58 @@ def get_all_pakka_lapse_customers():
         .select('*, customers(customer_name, full_address)')\
         .execute()
     
-    policies = response.data
+    policies = pd.DataFrame(response.data)
+    if policies.empty:
+        return []
     
-    lapsed_customers = []
-    today = date.today()
+    # Skip policies missing FUP date, premium amount or payment mode
+    premium_amount = pd.to_numeric(policies['premium_amount'], errors='coerce')
+    fup_date = pd.to_datetime(policies['current_fup_date'], format='%Y-%m-%d', errors='coerce')
+    last_payment_date = pd.to_datetime(policies['last_payment_date'], format='%Y-%m-%d', errors='coerce')
+    has_last_payment = policies['last_payment_date'].fillna('').astype(bool)
+    
+    valid = (
+        policies['current_fup_date'].fillna('').astype(bool)
+        & premium_amount.fillna(0).astype(bool)
+        & policies['payment_period'].fillna('').astype(bool)
+        # Skip policies whose dates can't be parsed
+        & fup_date.notna()
+        & ~(has_last_payment & last_payment_date.isna())
+    )
+    policies = policies[valid]
     
-    for policy in policies:
-        # Skip if missing required data
-        if not policy.get('current_fup_date') or not policy.get('premium_amount'):
-            continue
-        
-        # Skip if no payment mode
-        payment_mode = policy.get('payment_period')
-        if not payment_mode:
-            continue
+    # Calculate lapse status for every policy in one vectorized pass
+    result = get_premium_fines_bulk(pd.DataFrame({
+        'due_date': fup_date[valid],
+        'today': pd.Timestamp(date.today()),
+        'last_paid': last_payment_date[valid],
+        'payment_mode': policies['payment_period'],
+        'modal_premium': premium_amount[valid],
+    }))
+    
+    # Only include if Pakka Lapse
+    lapsed = result['policy_status'] == 'Pakka Lapse'
+    
+    lapsed_customers = []
+    for policy, row in zip(policies[lapsed].to_dict('records'), result[lapsed].itertuples()):
+        premium_amount = float(row.modal_premium)
+        fine = float(row.fine)
         
-        try:
-            # Parse FUP date
-            fup_date_str = policy['current_fup_date']
-            if isinstance(fup_date_str, str):
-                fup_date = datetime.strptime(fup_date_str, '%Y-%m-%d').date()
-            else:
-                fup_date = fup_date_str
-            
-            # Parse last payment date if available
-            last_payment_date = None
-            if policy.get('last_payment_date'):
-                last_payment_str = policy['last_payment_date']
-                if isinstance(last_payment_str, str):
-                    last_payment_date = datetime.strptime(last_payment_str, '%Y-%m-%d').date()
-                else:
-                    last_payment_date = last_payment_str
-            
-            # Get premium amount
-            premium_amount = float(policy['premium_amount'])
-            
-            # Calculate lapse status
-            result = get_premium_fine_details(
-                due_date=fup_date,
-                today_date=today,
-                payment_mode=payment_mode,
-                modal_premium=premium_amount,
-                last_premium_paid_date=last_payment_date
-            )
-            
-            # Only include if Pakka Lapse
-            if result['policy_status'] == 'Pakka Lapse':
-                total_payable = premium_amount + result['fine']
-                
-                # Get customer info
-                customer = policy.get('customers', {})
-                customer_name = customer.get('customer_name', 'Unknown') if customer else 'Unknown'
-                address = customer.get('full_address', 'N/A') if customer else 'N/A'
-                
-                lapsed_customers.append({
-                    'customer_name': customer_name,
-                    'policy_number': policy['policy_number'],
-                    'premium_amount': premium_amount,
-                    'fine': result['fine'],
-                    'total_payable': total_payable,
-                    'address': address,
-                    'payment_mode': payment_mode,
-                    'fup_date': fup_date.strftime('%d-%m-%Y')
-                })
+        # Get customer info
+        customer = policy.get('customers')
+        if not isinstance(customer, dict):
+            customer = {}
         
-        except Exception as e:
-            # Skip policies with calculation errors
-            continue
+        lapsed_customers.append({
+            'customer_name': customer.get('customer_name', 'Unknown') if customer else 'Unknown',
+            'policy_number': policy['policy_number'],
+            'premium_amount': premium_amount,
+            'fine': fine,
+            'total_payable': premium_amount + fine,
+            'address': customer.get('full_address', 'N/A') if customer else 'N/A',
+            'payment_mode': row.payment_mode,
+            'fup_date': row.due_date.strftime('%d-%m-%Y')
+        })
     
     return lapsed_customers
 
@@ -2546,6 +2678,11 @@ def main():
         db_exists, db_info = check_database_exists()
         st.write(f"**Database:** {'✅ Connected' if db_exists else '❌ Disconnected'}")
         
+        # Searches are cached for a minute; pick up changes made elsewhere now
+        if st.button("🔄 Refresh Data", use_container_width=True):
+            st.cache_data.clear()
+            st.rerun()
+        
         if db_exists:
             st.success("✅ Supabase Connected!")
             st.info(f"Using: {db_info}")
@@ -2674,17 +2811,26 @@ def main():
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         
-                        for idx, customer in enumerate(customers_to_delete):
+                        # One DELETE per batch instead of one per customer
+                        for start in range(0, len(customers_to_delete), DELETE_BATCH_SIZE):
+                            batch = customers_to_delete[start:start + DELETE_BATCH_SIZE]
+                            status_text.text(f"Deleting: {batch[0]['customer_name']} … {batch[-1]['customer_name']}")
                             try:
-                                supabase.table('customers').delete().eq('customer_id', customer['customer_id']).execute()
-                                deleted_count += 1
-                                status_text.text(f"Deleting: {customer['customer_name']}")
-                                progress_bar.progress((idx + 1) / len(customers_to_delete))
-                            except Exception as e:
-                                st.error(f"Failed to delete {customer['customer_name']}: {e}")
+                                supabase.table('customers').delete().in_('customer_id', [c['customer_id'] for c in batch]).execute()
+                                deleted_count += len(batch)
+                            except Exception:
+                                # Retry one by one so a single bad row doesn't block the rest
+                                for customer in batch:
+                                    try:
+                                        supabase.table('customers').delete().eq('customer_id', customer['customer_id']).execute()
+                                        deleted_count += 1
+                                    except Exception as e:
+                                        st.error(f"Failed to delete {customer['customer_name']}: {e}")
+                            progress_bar.progress(min(start + DELETE_BATCH_SIZE, len(customers_to_delete)) / len(customers_to_delete))
                         
                         progress_bar.empty()
                         status_text.empty()
+                        st.cache_data.clear()  # Cached searches may list deleted customers
                         st.success(f"✅ Successfully deleted {deleted_count} customers!")
                         st.session_state.customers_to_delete = None
                         st.rerun()
@@ -2790,7 +2936,8 @@ def main():
             if customers:
                 st.success(f"📊 Found **{len(customers)}** customers with **{total_policies}** policies")
                 
-                # Display customers
+                # Display customers (one stylesheet colors every card)
+                st.markdown(CARD_STYLESHEET, unsafe_allow_html=True)
                 for i, customer in enumerate(customers):
                     display_customer_card(customer, card_index=i)
                     
@@ -2814,7 +2961,8 @@ def main():
             if customers:
                 st.success(f"📊 Found **{len(customers)}** customers with **{total_policies}** policies")
                 
-                # Display customers
+                # Display customers (one stylesheet colors every card)
+                st.markdown(CARD_STYLESHEET, unsafe_allow_html=True)
                 for i, customer in enumerate(customers):
                     display_customer_card(customer, card_index=i)
                     
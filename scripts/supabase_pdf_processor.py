@@ -9,11 +9,14 @@ Processes PDFs from incoming folder and syncs with Supabase + Local Database:
 6. Backs up all data to local SQLite database
 """
 
+import argparse
 import pdfplumber
 import os
 import re
 import shutil
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 from supabase import create_client, Client
@@ -22,6 +25,78 @@ import sys
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# Precompiled patterns (used once per line/date while parsing PDFs)
+DATE_PATTERNS = [
+    (re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})'), 'DMY'),  # DD/MM/YYYY
+    (re.compile(r'(\d{1,2})-(\d{1,2})-(\d{4})'), 'DMY'),  # DD-MM-YYYY
+    (re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})'), 'YMD'),  # YYYY/MM/DD
+    (re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})'), 'YMD'),  # YYYY-MM-DD
+    (re.compile(r'(\d{1,2})/(\d{4})'), 'MY'),              # MM/YYYY (FUP format)
+]
+# The same layouts fused into one alternation, keyed by each layout's last group
+DATE_RE = re.compile('|'.join(pattern.pattern for pattern, _ in DATE_PATTERNS))
+DATE_RE_LAYOUTS = {}
+_group = 0
+for _pattern, _format_type in DATE_PATTERNS:
+    DATE_RE_LAYOUTS[_group + _pattern.groups] = (_format_type, _group + 1)
+    _group += _pattern.groups
+del _group, _pattern, _format_type
+WHITESPACE_RE = re.compile(r'\s+')
+NAME_PREFIX_RE = re.compile(r'^(Mr\.?|Mrs\.?|Ms\.?|Dr\.?|Prof\.?)\s+', re.IGNORECASE)
+DIGITS_ONLY_RE = re.compile(r'^\d+$')
+# Header agent code; [^\S\n] keeps the match on one line when searching joined header lines
+HEADER_AGENT_CODE_RE = re.compile(r'Agent[^\S\n]+Code[^\S\n]*:[^\S\n]*LIC(\d{7}N)', re.IGNORECASE)
+AGENT_CODE_RE = re.compile(r'LIC(\d{7}N)')
+FILENAME_AGENT_CODE_RE = re.compile(r'(\d{7}N)')
+# Commission pattern: Serial P/H_Name PolicyNo Pln/Tm DueDate ... Premium Commission
+# Example: "1 C NONDICHAMY 308700508 814-21 27/05/2025 27/08/2018 CBK2 26/05/2025 2640.00 132.00"
+COMMISSION_ROW_RE = re.compile(r'^\s*(\d+)\s+([A-Z][A-Za-z\s.]{2,50}?)\s+(\d{9})\s+(\d{3}[-/]\d{2})\s+(\d{1,2}/\d{1,2}/\d{4})?\s*(.*)$')
+# Premium Due pattern: S.No PolicyNo Name D.o.C Pln/Tm Mod FUP ... InstPrem ...
+# Example: "1 319566711 P.MARIMUTHU 14/10/2020 936/21 Hly 10/2024 14689.00 2 661.00"
+PREMIUM_DUE_ROW_RE = re.compile(r'^\s*(\d+)\s+(\d{9})\s+([A-Z][A-Za-z\s.]{2,50}?)\s+(\d{1,2}/\d{1,2}/\d{4})\s+(\d{3}[/-]\d{2})\s+([^\s]+)\s+(\d{1,2}/\d{4})\s*(.*)$')
+DECIMAL_AMOUNT_RE = re.compile(r'\b(\d+\.\d{2})\b')
+AMOUNT_RE = re.compile(r'(\d+\.?\d*)')
+# PDF payment mode → database format (Hly → Half-Yearly, Qly → Quarterly, ...)
+PAYMENT_MODE_MAP = {
+    'Hly': 'Half-Yearly',
+    'Qly': 'Quarterly',
+    'Yly': 'Yearly',
+    'Mly': 'Monthly',
+    'SSS': 'One-time'
+}
+# Per-policy success lines are only printed with --verbose; warnings,
+# errors, field changes and per-file summaries are always shown
+VERBOSE = False
+# Below this many PDFs a process pool costs more to start than it saves
+PARALLEL_PARSE_MIN_FILES = 2
+# Document type keywords, one scan of the text per type
+PREMIUM_DUE_MARKERS_RE = re.compile(r'Premium Due|Name of Assured')
+COMMISSION_MARKERS_RE = re.compile(r'Commission|P/H Name')
+
+# Local backup statements. The SQL text never varies, so sqlite3's statement
+# cache prepares each one once per connection instead of once per policy.
+LOCAL_INSERT_CUSTOMER_SQL = '''
+    INSERT INTO customers (customer_name, extraction_method, created_date, last_updated)
+    VALUES (?, ?, ?, ?)
+'''
+LOCAL_INSERT_POLICY_SQL = '''
+    INSERT INTO policies (
+        policy_number, customer_id, agent_code, plan_name, 
+        premium_amount, sum_assured, date_of_commencement, 
+        payment_period, current_fup_date, created_date, last_updated
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+LOCAL_UPDATE_POLICY_SQL = '''
+    UPDATE policies 
+    SET current_fup_date = COALESCE(?, current_fup_date),
+        premium_amount = COALESCE(?, premium_amount),
+        plan_name = COALESCE(?, plan_name),
+        sum_assured = COALESCE(?, sum_assured),
+        agent_code = COALESCE(?, agent_code),
+        last_updated = ?
+    WHERE policy_number = ?
+'''
+
 def get_supabase_client() -> Client:
     """Get Supabase client from secrets"""
     try:
@@ -30,8 +105,12 @@ def get_supabase_client() -> Client:
             secrets_path = Path(__file__).parent.parent / 'scripts' / '.streamlit' / 'secrets.toml'
         
         if secrets_path.exists():
-            import toml
-            secrets = toml.load(secrets_path)
+            try:
+                import tomllib
+            except ImportError:  # Python < 3.11
+                import tomli as tomllib
+            with open(secrets_path, 'rb') as f:
+                secrets = tomllib.load(f)
             url = secrets['supabase']['url']
             key = secrets['supabase']['key']
         else:
@@ -56,8 +135,18 @@ def get_local_db_connection():
         db_path.parent.mkdir(parents=True, exist_ok=True)
         
         conn = sqlite3.connect(str(db_path))
+
+        # Tune for the write-heavy sync loop: WAL + NORMAL avoids an fsync per commit
+        conn.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA cache_size = -64000;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA mmap_size = 268435456;
+        ''')
+
         cursor = conn.cursor()
-        
+
         # Create customers table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS customers (
@@ -92,11 +181,9 @@ def get_local_db_connection():
             )
         ''')
         
-        # Create index on policy_number
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_policy_number 
-            ON policies(policy_number)
-        ''')
+        # policy_number is UNIQUE, so SQLite already keeps an index for it;
+        # a second one only doubles the B-tree work on every insert
+        cursor.execute('DROP INDEX IF EXISTS idx_policy_number')
         
         # Create index on customer_name
         cursor.execute('''
@@ -109,6 +196,29 @@ def get_local_db_connection():
     except Exception as e:
         raise Exception(f"Failed to create local database: {e}")
 
+def _date_from_groups(format_type, groups):
+    """Build a YYYY-MM-DD string from one date pattern's groups, or None if out of range"""
+    if format_type == 'YMD':
+        year, month, day = groups
+    elif format_type == 'DMY':
+        day, month, year = groups
+    elif format_type == 'MY':
+        month, year = groups
+        day = '01'  # Use first day of month for FUP dates
+    else:
+        return None
+    
+    try:
+        day_int = int(day)
+        month_int = int(month)
+        year_int = int(year)
+        
+        if 1 <= day_int <= 31 and 1 <= month_int <= 12 and 1900 <= year_int <= 2100:
+            return f"{year_int:04d}-{month_int:02d}-{day_int:02d}"
+    except ValueError:
+        pass
+    return None
+
 def parse_date(date_str):
     """Parse date string in various formats and return YYYY-MM-DD format"""
     if not date_str or date_str.strip() == "":
@@ -116,39 +226,23 @@ def parse_date(date_str):
         
     date_str = date_str.strip()
     
-    # Common date patterns
-    patterns = [
-        (r'(\d{1,2})/(\d{1,2})/(\d{4})', 'DMY'),  # DD/MM/YYYY
-        (r'(\d{1,2})-(\d{1,2})-(\d{4})', 'DMY'),  # DD-MM-YYYY
-        (r'(\d{4})/(\d{1,2})/(\d{1,2})', 'YMD'),  # YYYY/MM/DD
-        (r'(\d{4})-(\d{1,2})-(\d{1,2})', 'YMD'),  # YYYY-MM-DD
-        (r'(\d{1,2})/(\d{4})', 'MY'),              # MM/YYYY (FUP format)
-    ]
-    
-    for pattern, format_type in patterns:
-        match = re.search(pattern, date_str)
+    # Single scan over all layouts; lastindex tells which one matched
+    match = DATE_RE.search(date_str)
+    if not match:
+        return None
+    
+    format_type, first_group = DATE_RE_LAYOUTS[match.lastindex]
+    parsed = _date_from_groups(format_type, match.groups()[first_group - 1:match.lastindex])
+    if parsed:
+        return parsed
+    
+    # First hit was out of range - try each layout in order as before
+    for pattern, format_type in DATE_PATTERNS:
+        match = pattern.search(date_str)
         if match:
-            groups = match.groups()
-            
-            if format_type == 'YMD':
-                year, month, day = groups
-            elif format_type == 'DMY':
-                day, month, year = groups
-            elif format_type == 'MY':
-                month, year = groups
-                day = '01'  # Use first day of month for FUP dates
-            else:
-                continue
-            
-            try:
-                day_int = int(day)
-                month_int = int(month)
-                year_int = int(year)
-                
-                if 1 <= day_int <= 31 and 1 <= month_int <= 12 and 1900 <= year_int <= 2100:
-                    return f"{year_int:04d}-{month_int:02d}-{day_int:02d}"
-            except ValueError:
-                continue
+            parsed = _date_from_groups(format_type, match.groups())
+            if parsed:
+                return parsed
     
     return None
 
@@ -189,19 +283,20 @@ def normalize_sum_assured(value):
     except (ValueError, TypeError):
         return None
 
+@lru_cache(maxsize=4096)
 def clean_customer_name(name):
-    """Clean and standardize customer names"""
+    """Clean and standardize customer names (cached - the same names repeat across PDFs)"""
     if not name:
         return None
     
     # Remove extra whitespace and normalize
-    name = re.sub(r'\s+', ' ', name.strip())
+    name = WHITESPACE_RE.sub(' ', name.strip())
     
     # Remove common prefixes
-    name = re.sub(r'^(Mr\.?|Mrs\.?|Ms\.?|Dr\.?|Prof\.?)\s+', '', name, flags=re.IGNORECASE)
+    name = NAME_PREFIX_RE.sub('', name)
     
     # Skip if it looks like a policy number
-    if re.match(r'^\d+$', name) or len(name) < 3:
+    if DIGITS_ONLY_RE.match(name) or len(name) < 3:
         return None
     
     return name.strip().upper()
@@ -215,23 +310,21 @@ def extract_commission_details(text):
     
     # First, try to extract agent code from the header
     agent_code_from_header = None
-    for line in lines[:20]:  # Check first 20 lines for agent code
-        agent_match = re.search(r'Agent\s+Code\s*:\s*LIC(\d{7}N)', line, re.IGNORECASE)
-        if agent_match:
-            agent_code_from_header = agent_match.group(1)
-            print(f"    📋 Found Agent Code in header: {agent_code_from_header}")
-            break
+    agent_match = HEADER_AGENT_CODE_RE.search('\n'.join(lines[:20]))  # Check first 20 lines for agent code
+    if agent_match:
+        agent_code_from_header = agent_match.group(1)
+        print(f"    📋 Found Agent Code in header: {agent_code_from_header}")
     
     for line in lines:
         line_clean = line.strip()
         if not line_clean or line_clean.startswith('S.No') or 'P/H Name' in line or 'Agent commmision' in line:
             continue
         
-        # Commission pattern: Serial P/H_Name PolicyNo Pln/Tm DueDate ... Premium Commission
-        # Example: "1 C NONDICHAMY 308700508 814-21 27/05/2025 27/08/2018 CBK2 26/05/2025 2640.00 132.00"
-        commission_pattern = r'^\s*(\d+)\s+([A-Z][A-Za-z\s.]{2,50}?)\s+(\d{9})\s+(\d{3}[-/]\d{2})\s+(\d{1,2}/\d{1,2}/\d{4})?\s*(.*)$'
+        # Table rows start with the serial number - skip anything else before the regex
+        if not line_clean[0].isdigit():
+            continue
         
-        match = re.match(commission_pattern, line_clean)
+        match = COMMISSION_ROW_RE.match(line_clean)
         if match:
             policy_no = match.group(3)
             name = match.group(2).strip()
@@ -247,7 +340,7 @@ def extract_commission_details(text):
                 # Format: ... FUP_Date Premium Commission
                 # Example: "11/10/2025 812.00 48.72"
                 # Look for decimal amounts only (not dates)
-                amounts = re.findall(r'\b(\d+\.\d{2})\b', remaining)
+                amounts = DECIMAL_AMOUNT_RE.findall(remaining)
                 premium_amount = None
                 
                 if len(amounts) >= 2:
@@ -272,7 +365,8 @@ def extract_commission_details(text):
                     'agent_code_from_pdf': agent_code_from_header  # Store agent code from header
                 })
                 
-                print(f"    ✅ {policy_no} → {cleaned_name}")
+                if VERBOSE:
+                    print(f"    ✅ {policy_no} → {cleaned_name}")
     
     return details
 
@@ -285,23 +379,21 @@ def extract_premium_due_details(text):
     
     # Extract agent code from top of PDF (e.g., "LIC0163674N" → "0163674N")
     agent_code = None
-    for line in lines[:20]:  # Check first 20 lines for agent code
-        agent_match = re.search(r'LIC(\d{7}N)', line)
-        if agent_match:
-            agent_code = agent_match.group(1)
-            print(f"    🏢 Agent Code extracted: {agent_code}")
-            break
+    agent_match = AGENT_CODE_RE.search('\n'.join(lines[:20]))  # Check first 20 lines for agent code
+    if agent_match:
+        agent_code = agent_match.group(1)
+        print(f"    🏢 Agent Code extracted: {agent_code}")
     
     for line in lines:
         line_clean = line.strip()
         if not line_clean or line_clean.startswith('S.No') or 'PolicyNo' in line:
             continue
         
-        # Premium Due pattern: S.No PolicyNo Name D.o.C Pln/Tm Mod FUP ... InstPrem ...
-        # Example: "1 319566711 P.MARIMUTHU 14/10/2020 936/21 Hly 10/2024 14689.00 2 661.00"
-        premium_pattern = r'^\s*(\d+)\s+(\d{9})\s+([A-Z][A-Za-z\s.]{2,50}?)\s+(\d{1,2}/\d{1,2}/\d{4})\s+(\d{3}[/-]\d{2})\s+([^\s]+)\s+(\d{1,2}/\d{4})\s*(.*)$'
+        # Table rows start with the serial number - skip anything else before the regex
+        if not line_clean[0].isdigit():
+            continue
         
-        match = re.match(premium_pattern, line_clean)
+        match = PREMIUM_DUE_ROW_RE.match(line_clean)
         if match:
             policy_no = match.group(2)
             name = match.group(3).strip()
@@ -317,18 +409,10 @@ def extract_premium_due_details(text):
                 parsed_fup = parse_date(fup_date)
                 
                 # Map payment mode from PDF format to database format
-                # Hly → Half-Yearly, Qly → Quarterly, Yly → Yearly, Mly → Monthly
-                payment_mode_map = {
-                    'Hly': 'Half-Yearly',
-                    'Qly': 'Quarterly',
-                    'Yly': 'Yearly',
-                    'Mly': 'Monthly',
-                    'SSS': 'One-time'
-                }
-                payment_period = payment_mode_map.get(mode, mode)  # Use mapping or keep original
+                payment_period = PAYMENT_MODE_MAP.get(mode, mode)  # Use mapping or keep original
                 
                 # Extract amounts
-                amounts = re.findall(r'(\d+\.?\d*)', remaining)
+                amounts = AMOUNT_RE.findall(remaining)
                 inst_prem = None
                 
                 if len(amounts) >= 1:
@@ -353,7 +437,8 @@ def extract_premium_due_details(text):
                 
                 details.append(policy_details)
                 
-                print(f"    ✅ {policy_no} → {cleaned_name} (FUP: {fup_date}, Mode: {payment_period})")
+                if VERBOSE:
+                    print(f"    ✅ {policy_no} → {cleaned_name} (FUP: {fup_date}, Mode: {payment_period})")
     
     return details
 
@@ -404,10 +489,20 @@ def find_or_create_customer(supabase: Client, customer_name: str, existing_custo
             print(f"  ❌ Failed to create customer {customer_name}: {e}")
             return None
 
+def get_local_lookups(local_conn: sqlite3.Connection):
+    """Load local customer IDs (by name) and policy numbers once per run"""
+    # Descending so the lowest customer_id wins for repeated names, as the old lookup query did
+    local_customers = dict(local_conn.execute(
+        'SELECT customer_name, customer_id FROM customers ORDER BY customer_id DESC'
+    ))
+    local_policies = {row[0] for row in local_conn.execute('SELECT policy_number FROM policies')}
+    return local_customers, local_policies
+
 def sync_policy_to_supabase(supabase: Client, policy_data: dict, existing_policies: dict, 
                             existing_customers: dict, agent_code: str, stats: dict, 
                             local_conn: sqlite3.Connection = None, is_commission_pdf: bool = False,
-                            is_premium_due_pdf: bool = False):
+                            is_premium_due_pdf: bool = False, local_customers: dict = None,
+                            local_policies: set = None):
     """
     Sync a single policy to Supabase AND local database following the rules:
     1. Create new policy if doesn't exist
@@ -550,14 +645,16 @@ def sync_policy_to_supabase(supabase: Client, policy_data: dict, existing_polici
         if updates:
             try:
                 supabase.table('policies').update(updates).eq('policy_number', policy_number).execute()
-                print(f"  ✅ Supabase Cloud: Updated policy {policy_number}")
+                if VERBOSE:
+                    print(f"  ✅ Supabase Cloud: Updated policy {policy_number}")
                 supabase_success = True
                 stats['updated'] += 1
             except Exception as e:
                 print(f"  ❌ Supabase Cloud: Failed to update policy {policy_number}: {e}")
                 stats['errors'] += 1
         else:
-            print(f"  ℹ️  No updates needed for {policy_number}")
+            if VERBOSE:
+                print(f"  ℹ️  No updates needed for {policy_number}")
             supabase_success = True  # No updates needed is considered success
             stats['skipped'] += 1
     else:
@@ -578,7 +675,8 @@ def sync_policy_to_supabase(supabase: Client, policy_data: dict, existing_polici
                 new_policy['current_fup_date'] = policy_data['current_fup_date']
             
             supabase.table('policies').insert(new_policy).execute()
-            print(f"  ✅ Supabase Cloud: Created new policy {policy_number}")
+            if VERBOSE:
+                print(f"  ✅ Supabase Cloud: Created new policy {policy_number}")
             supabase_success = True
             stats['created'] += 1
         except Exception as e:
@@ -590,71 +688,35 @@ def sync_policy_to_supabase(supabase: Client, policy_data: dict, existing_polici
         try:
             cursor = local_conn.cursor()
             
+            # The caller holds one transaction per file; a savepoint lets a
+            # failing policy roll back without losing the rest of the file
+            cursor.execute('SAVEPOINT sync_policy')
+            
             # Get or create customer in local DB
-            cursor.execute('SELECT customer_id FROM customers WHERE customer_name = ?', 
-                          (customer_name,))
-            local_customer = cursor.fetchone()
+            local_customer_id = local_customers.get(customer_name)
             
-            if not local_customer:
-                cursor.execute('''
-                    INSERT INTO customers (customer_name, extraction_method, created_date, last_updated)
-                    VALUES (?, ?, ?, ?)
-                ''', (customer_name, 'pdf_import', datetime.now().isoformat(), datetime.now().isoformat()))
+            if local_customer_id is None:
+                cursor.execute(LOCAL_INSERT_CUSTOMER_SQL, (customer_name, 'pdf_import', datetime.now().isoformat(), datetime.now().isoformat()))
                 local_customer_id = cursor.lastrowid
-            else:
-                local_customer_id = local_customer[0]
             
             # Check if policy exists in local DB
-            cursor.execute('SELECT policy_id FROM policies WHERE policy_number = ?', 
-                          (policy_number,))
-            local_policy = cursor.fetchone()
-            
-            if local_policy:
-                # Update existing policy
-                update_fields = []
-                update_values = []
-                
-                if policy_data.get('current_fup_date'):
-                    update_fields.append('current_fup_date = ?')
-                    update_values.append(policy_data['current_fup_date'])
-                
-                if fields_to_update.get('premium_amount'):
-                    update_fields.append('premium_amount = ?')
-                    update_values.append(fields_to_update['premium_amount'])
-                
-                if fields_to_update.get('plan_name'):
-                    update_fields.append('plan_name = ?')
-                    update_values.append(fields_to_update['plan_name'])
-                
-                if fields_to_update.get('sum_assured'):
-                    update_fields.append('sum_assured = ?')
-                    update_values.append(fields_to_update['sum_assured'])
-                
-                if agent_code:
-                    update_fields.append('agent_code = ?')
-                    update_values.append(agent_code)
-                
-                update_fields.append('last_updated = ?')
-                update_values.append(datetime.now().isoformat())
-                
-                if update_fields:
-                    update_values.append(policy_number)
-                    cursor.execute(f'''
-                        UPDATE policies 
-                        SET {', '.join(update_fields)}
-                        WHERE policy_number = ?
-                    ''', update_values)
+            if policy_number in local_policies:
+                # Update existing policy - empty values keep the stored ones
+                cursor.execute(LOCAL_UPDATE_POLICY_SQL, (
+                    policy_data.get('current_fup_date') or None,
+                    fields_to_update.get('premium_amount') or None,
+                    fields_to_update.get('plan_name') or None,
+                    fields_to_update.get('sum_assured') or None,
+                    agent_code or None,
+                    datetime.now().isoformat(),
+                    policy_number
+                ))
+                if VERBOSE:
                     print(f"  ✅ Local Database: Updated policy {policy_number}")
-                    local_success = True
+                local_success = True
             else:
                 # Insert new policy
-                cursor.execute('''
-                    INSERT INTO policies (
-                        policy_number, customer_id, agent_code, plan_name, 
-                        premium_amount, sum_assured, date_of_commencement, 
-                        payment_period, current_fup_date, created_date, last_updated
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                cursor.execute(LOCAL_INSERT_POLICY_SQL, (
                     policy_number,
                     local_customer_id,
                     agent_code,
@@ -667,18 +729,25 @@ def sync_policy_to_supabase(supabase: Client, policy_data: dict, existing_polici
                     datetime.now().isoformat(),
                     datetime.now().isoformat()
                 ))
-                print(f"  ✅ Local Database: Created new policy {policy_number}")
+                if VERBOSE:
+                    print(f"  ✅ Local Database: Created new policy {policy_number}")
                 local_success = True
             
-            local_conn.commit()
+            cursor.execute('RELEASE SAVEPOINT sync_policy')
+            
+            # Only remember the rows once they can no longer be rolled back
+            local_customers[customer_name] = local_customer_id
+            local_policies.add(policy_number)
             
         except Exception as e:
             print(f"  ❌ Local Database: Failed to sync policy {policy_number}: {e}")
-            local_conn.rollback()
+            local_conn.execute('ROLLBACK TO SAVEPOINT sync_policy')
+            local_conn.execute('RELEASE SAVEPOINT sync_policy')
     
     # Print overall status
     if supabase_success and local_success:
-        print(f"  🎉 SUCCESS: Policy {policy_number} synced to both Cloud and Local DB")
+        if VERBOSE:
+            print(f"  🎉 SUCCESS: Policy {policy_number} synced to both Cloud and Local DB")
     elif supabase_success:
         print(f"  ⚠️  PARTIAL: Policy {policy_number} synced to Cloud only")
     elif local_success:
@@ -686,6 +755,21 @@ def sync_policy_to_supabase(supabase: Client, policy_data: dict, existing_polici
     else:
         print(f"  ❌ FAILED: Policy {policy_number} not synced to any database")
 
+def extract_page_text(page):
+    """Extract a page's text, then drop its cached layout objects"""
+    text = page.extract_text()
+    page.close()
+    return text
+
+def extract_pdf_text(pdf_file):
+    """Extract text from a PDF; runs in a worker process so files parse in parallel"""
+    try:
+        with pdfplumber.open(pdf_file) as pdf:
+            text = "".join(extract_page_text(page) or "" for page in pdf.pages)
+        return text, None
+    except Exception as e:
+        return None, e
+
 def process_pdf_files():
     """Main processing function"""
     print("\n" + "="*60)
@@ -713,12 +797,14 @@ def process_pdf_files():
     try:
         print("💾 Connecting to Local Database...")
         local_conn = get_local_db_connection()
+        local_customers, local_policies = get_local_lookups(local_conn)
         print("✅ Connected to Local Database")
         print(f"   📍 Location: {Path(__file__).parent.parent / 'data' / 'lic_local_backup.db'}")
     except Exception as e:
         print(f"⚠️  Warning: Local database not available: {e}")
         print("   Continuing with Supabase Cloud only...")
         local_conn = None
+        local_customers, local_policies = {}, set()
     
     # Get existing data
     existing_policies = get_existing_policies(supabase)
@@ -745,23 +831,29 @@ def process_pdf_files():
     # Track files with errors (stay in incoming)
     error_files = []
     
+    # Parse PDFs across CPU cores; syncing below stays sequential and
+    # consumes results in order as each file finishes parsing
+    if len(pdf_files) >= PARALLEL_PARSE_MIN_FILES:
+        executor = ProcessPoolExecutor(max_workers=min(len(pdf_files), os.cpu_count() or 1))
+        pdf_texts = executor.map(extract_pdf_text, pdf_files)
+    else:
+        executor = None
+        pdf_texts = map(extract_pdf_text, pdf_files)
+    
     # Process each PDF
-    for pdf_file in pdf_files:
+    for pdf_file, (text, read_error) in zip(pdf_files, pdf_texts):
         print(f"\n📄 Processing: {pdf_file.name}")
         
         try:
             # Extract agent code from filename
             agent_code = None
-            agent_match = re.search(r'(\d{7}N)', pdf_file.name)
+            agent_match = FILENAME_AGENT_CODE_RE.search(pdf_file.name)
             if agent_match:
                 agent_code = agent_match.group(1)
                 print(f"  👤 Agent: {agent_code}")
             
-            # Extract text from PDF
-            with pdfplumber.open(pdf_file) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    text += page.extract_text() or ""
+            if read_error:
+                raise read_error
             
             if not text.strip():
                 print(f"  ❌ ERROR: No readable text in PDF - keeping in incoming folder")
@@ -775,11 +867,11 @@ def process_pdf_files():
             is_premium_due_pdf = False
             
             # Check filename and content for document type (Premium Due takes priority)
-            if 'Premdue' in pdf_file.name or 'Premium Due' in text or 'Name of Assured' in text:
+            if 'Premdue' in pdf_file.name or PREMIUM_DUE_MARKERS_RE.search(text):
                 print("  📋 Document type: Premium Due")
                 is_premium_due_pdf = True
                 policy_details = extract_premium_due_details(text)
-            elif 'Commission' in text or 'P/H Name' in text or 'CM-' in pdf_file.name:
+            elif COMMISSION_MARKERS_RE.search(text) or 'CM-' in pdf_file.name:
                 print("  📋 Document type: Commission")
                 is_commission_pdf = True
                 policy_details = extract_commission_details(text)
@@ -794,7 +886,12 @@ def process_pdf_files():
             
             print(f"  📊 Found {len(policy_details)} policies")
             
+            # Write the whole file's policies to the local DB in one transaction
+            if local_conn:
+                local_conn.execute('BEGIN')
+            
             # Process each policy
+            stats_before = dict(stats)
             for detail in policy_details:
                 sync_policy_to_supabase(
                     supabase, 
@@ -805,22 +902,42 @@ def process_pdf_files():
                     stats,
                     local_conn,
                     is_commission_pdf,
-                    is_premium_due_pdf
+                    is_premium_due_pdf,
+                    local_customers=local_customers,
+                    local_policies=local_policies
                 )
             
-            # Move to processed
-            shutil.move(str(pdf_file), str(processed_path / pdf_file.name))
+            if local_conn:
+                local_conn.commit()
+            
+            print(f"  📊 Synced: {stats['created'] - stats_before['created']} created, "
+                  f"{stats['updated'] - stats_before['updated']} updated, "
+                  f"{stats['skipped'] - stats_before['skipped']} unchanged, "
+                  f"{stats['errors'] - stats_before['errors']} errors")
+            
+            # Move to processed - a plain rename when incoming/ and processed/
+            # share a filesystem, falling back to copy+delete across devices
+            try:
+                os.replace(pdf_file, processed_path / pdf_file.name)
+            except OSError:
+                shutil.move(str(pdf_file), str(processed_path / pdf_file.name))
             stats['files_processed'] += 1
             print(f"  ✅ Moved to processed folder")
             
         except Exception as e:
             print(f"  ❌ ERROR: {e}")
             print(f"  ⚠️  File kept in incoming folder for retry")
+            # Keep whatever was already synced locally, as per-policy commits did
+            if local_conn and local_conn.in_transaction:
+                local_conn.commit()
             error_files.append(pdf_file.name)
             stats['files_with_errors'] += 1
             import traceback
             traceback.print_exc()
     
+    if executor:
+        executor.shutdown()
+    
     # Print summary
     print("\n" + "="*60)
     print("📊 PROCESSING SUMMARY")
@@ -847,4 +964,7 @@ def process_pdf_files():
         print(f"📍 Backup saved at: {Path(__file__).parent.parent / 'data' / 'lic_local_backup.db'}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process LIC PDFs and sync them to Supabase Cloud + Local Database")
+    parser.add_argument('--verbose', action='store_true', help="print a line for every policy parsed and synced")
+    VERBOSE = parser.parse_args().verbose
     process_pdf_files()
@@ -9,10 +9,36 @@ Policy information is in table with columns "PolicyNo" and "Name of Assured"
 import pdfplumber
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from datetime import datetime
 from supabase import create_client, Client
 
+# Agent code patterns, searched once over the joined header lines.
+# [^\S\n] keeps "Agent Code : LIC..." from matching across two lines.
+PREMIUM_DUE_AGENT_CODE_RE = re.compile(r'Agent[^\S\n]+Code[^\S\n]*:[^\S\n]*LIC(\d{7}N)', re.IGNORECASE)
+COMMISSION_AGENT_CODE_RE = re.compile(r'LIC(\d{7}N)(?:-\d+)?')
+
+# (pdf type, first-page text marker, filename marker), checked in order
+PDF_TYPE_MARKERS = (
+    ('premium_due', 'premium due', 'premdue'),
+    ('commission', 'commission', 'commission'),
+)
+
+# Row scanning patterns, compiled once instead of per table line
+POLICY_NUMBER_RE = re.compile(r'\b(\d{9})\b')
+ALPHA_WORD_RE = re.compile(r'[A-Za-z]{3,}')
+ASSURED_NAME_RE = re.compile(r'([A-Z][A-Za-z\s\.]{2,50})')
+# Drops dots so "Policy.No" headers are caught by the header check
+DROP_DOTS = str.maketrans('', '', '.')
+
+# Policy numbers per IN (...) lookup (keeps the request URL short)
+LOOKUP_BATCH_SIZE = 200
+
+# Rows per bulk insert request (keeps request bodies well under PostgREST limits)
+INSERT_BATCH_SIZE = 500
+
 def get_supabase_client() -> Client:
     """Get Supabase client from secrets"""
     try:
@@ -21,8 +47,12 @@ def get_supabase_client() -> Client:
             secrets_path = Path(__file__).parent.parent / 'scripts' / '.streamlit' / 'secrets.toml'
         
         if secrets_path.exists():
-            import toml
-            secrets = toml.load(secrets_path)
+            try:
+                import tomllib
+            except ImportError:  # Python < 3.11
+                import tomli as tomllib
+            with open(secrets_path, 'rb') as f:
+                secrets = tomllib.load(f)
             url = secrets['supabase']['url']
             key = secrets['supabase']['key']
         else:
@@ -37,165 +67,175 @@ def get_supabase_client() -> Client:
     except Exception as e:
         raise Exception(f"Failed to connect to Supabase: {e}")
 
-def extract_agent_code_from_premium_due_pdf(pdf_path):
-    """Extract agent code from Premium Due PDF header (format: Agent Code : LICxxxxxxN)"""
+def extract_page_text(page):
+    """Extract a page's text, then drop its cached layout objects"""
+    text = page.extract_text()
+    page.close()
+    return text
+
+def extract_pdf_pages(pdf_path, first_page=0, max_pages=None):
+    """Return the extracted text of a PDF's pages, from first_page onwards
+    (at most max_pages of them when given)"""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            
-            if not text:
-                return None
-            
-            lines = text.split('\n')
-            
-            # Look for "Agent Code : LICxxxxxxN" in first 20 lines
-            for line in lines[:20]:
-                # Match pattern: Agent Code : LIC0163674N
-                # Extract only the part after LIC (0163674N)
-                agent_match = re.search(r'Agent\s+Code\s*:\s*LIC(\d{7}N)', line, re.IGNORECASE)
-                if agent_match:
-                    agent_code = agent_match.group(1)
-                    return agent_code
-            
-            return None
+        if max_pages is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                return [extract_page_text(page) for page in pdf.pages[first_page:]]
+        # Only build page objects for the requested (1-based) page numbers
+        wanted = list(range(first_page + 1, first_page + max_pages + 1))
+        with pdfplumber.open(pdf_path, pages=wanted) as pdf:
+            return [extract_page_text(page) for page in pdf.pages]
     except Exception as e:
         print(f"  ❌ Error reading {pdf_path.name}: {e}")
+        return []
+
+def extract_agent_code_from_premium_due_pdf(pages):
+    """Extract agent code from Premium Due PDF header (format: Agent Code : LICxxxxxxN)"""
+    text = pages[0] if pages else None
+    
+    if not text:
         return None
+    
+    lines = text.split('\n')
+    
+    # Look for "Agent Code : LICxxxxxxN" in first 20 lines
+    # Match pattern: Agent Code : LIC0163674N
+    # Extract only the part after LIC (0163674N)
+    agent_match = PREMIUM_DUE_AGENT_CODE_RE.search('\n'.join(lines[:20]))
+    if agent_match:
+        return agent_match.group(1)
+    
+    return None
 
-def extract_agent_code_from_commission_pdf(pdf_path):
+def extract_agent_code_from_commission_pdf(pages):
     """Extract agent code from Commission Bill PDF (format: LICxxxxxxN-xxxxx)"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            
-            if not text:
-                return None
-            
-            lines = text.split('\n')
-            
-            # Look for pattern like "LIC0089174N-77375" in first 30 lines
-            for line in lines[:30]:
-                # Match pattern: LIC followed by 7 digits and N, then optional suffix
-                # We want to extract only the part after LIC and before the hyphen
-                agent_match = re.search(r'LIC(\d{7}N)(?:-\d+)?', line)
-                if agent_match:
-                    agent_code = agent_match.group(1)
-                    return agent_code
-            
-            return None
-    except Exception as e:
-        print(f"  ❌ Error reading {pdf_path.name}: {e}")
+    text = pages[0] if pages else None
+    
+    if not text:
         return None
+    
+    lines = text.split('\n')
+    
+    # Look for pattern like "LIC0089174N-77375" in first 30 lines
+    # Match pattern: LIC followed by 7 digits and N, then optional suffix
+    # We want to extract only the part after LIC and before the hyphen
+    agent_match = COMMISSION_AGENT_CODE_RE.search('\n'.join(lines[:30]))
+    if agent_match:
+        return agent_match.group(1)
+    
+    return None
 
-def detect_pdf_type(pdf_path):
+def detect_pdf_type(pdf_path, pages):
     """Detect if PDF is Premium Due or Commission Bill type"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            
-            if not text:
-                return None
-            
-            text_lower = text.lower()
-            
-            # Check for indicators
-            if 'premium due' in text_lower or 'premdue' in pdf_path.name.lower():
-                return 'premium_due'
-            elif 'commission' in text_lower or 'commission' in pdf_path.name.lower():
-                return 'commission'
-            
-            return None
-    except Exception as e:
-        print(f"  ❌ Error detecting PDF type for {pdf_path.name}: {e}")
+    text = pages[0] if pages else None
+    
+    if not text:
         return None
+    
+    text_lower = text.lower()
+    name_lower = pdf_path.name.lower()
+    
+    # Check for indicators, in priority order
+    for pdf_type, text_marker, name_marker in PDF_TYPE_MARKERS:
+        if text_marker in text_lower or name_marker in name_lower:
+            return pdf_type
+    
+    return None
+
+def get_agent_code(pdf_path, pages):
+    """Detect the PDF type and read the agent code from its header
+    Returns tuple: (pdf_type, agent_code)"""
+    pdf_type = detect_pdf_type(pdf_path, pages)
+    
+    if pdf_type == 'premium_due':
+        agent_code = extract_agent_code_from_premium_due_pdf(pages)
+    elif pdf_type == 'commission':
+        agent_code = extract_agent_code_from_commission_pdf(pages)
+    else:
+        # Try both extraction methods
+        agent_code = extract_agent_code_from_premium_due_pdf(pages)
+        if not agent_code:
+            agent_code = extract_agent_code_from_commission_pdf(pages)
+    
+    return pdf_type, agent_code
 
-def extract_policy_details_from_pdf(pdf_path):
-    """Extract policy numbers with customer names from PDF
+def extract_policy_details_from_pdf(pdf_path, pages):
+    """Extract policy numbers with customer names from PDF page texts
     Returns dict: {policy_number: customer_name}"""
     policy_details = {}
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                
-                if not text:
+        for text in pages:
+            if not text:
+                continue
+            
+            lines = text.split('\n')
+            
+            # Look for lines with policy numbers and names
+            for line in lines:
+                # Skip obvious header lines
+                if 'S.No' in line or 'Policy' in line.translate(DROP_DOTS) and 'No' in line:
                     continue
                 
-                lines = text.split('\n')
+                # Find 9-digit policy numbers
+                policy_matches = POLICY_NUMBER_RE.findall(line)
                 
-                # Look for lines with policy numbers and names
-                for line in lines:
-                    # Skip obvious header lines
-                    if 'S.No' in line or 'Policy' in line.replace('.', '') and 'No' in line:
-                        continue
-                    
-                    # Find 9-digit policy numbers
-                    policy_matches = re.findall(r'\b(\d{9})\b', line)
+                if policy_matches:
+                    # Extract potential customer name from the line
+                    # Remove the policy number and extract alphabetic text
+                    line_clean = line
+                    for policy_no in policy_matches:
+                        line_clean = line_clean.replace(policy_no, '')
                     
-                    if policy_matches:
-                        # Extract potential customer name from the line
-                        # Remove the policy number and extract alphabetic text
-                        line_clean = line
-                        for policy_no in policy_matches:
-                            line_clean = line_clean.replace(policy_no, '')
+                    # Extract name (sequences of alphabetic characters and spaces)
+                    # Look for names that are at least 3 characters
+                    name_match = ASSURED_NAME_RE.search(line_clean)
+                    if name_match:
+                        customer_name = name_match.group(1).strip()
+                        # Clean up extra spaces
+                        customer_name = ' '.join(customer_name.split())
                         
-                        # Extract name (sequences of alphabetic characters and spaces)
-                        # Look for names that are at least 3 characters
-                        name_match = re.search(r'([A-Z][A-Za-z\s\.]{2,50})', line_clean)
-                        if name_match:
-                            customer_name = name_match.group(1).strip()
-                            # Clean up extra spaces
-                            customer_name = ' '.join(customer_name.split())
-                            
-                            for policy_no in policy_matches:
-                                if policy_no not in policy_details:
-                                    policy_details[policy_no] = customer_name
+                        for policy_no in policy_matches:
+                            if policy_no not in policy_details:
+                                policy_details[policy_no] = customer_name
         
         return policy_details
     except Exception as e:
         print(f"  ❌ Error extracting policy details from {pdf_path.name}: {e}")
         return {}
 
-def extract_policy_numbers_from_pdf(pdf_path):
-    """Extract all policy numbers from Premium Due or Commission Bill PDF
+def extract_policy_numbers_from_pdf(pdf_path, pages):
+    """Extract all policy numbers from Premium Due or Commission Bill page texts
     Uses flexible pattern matching to find 9-digit policy numbers with adjacent names"""
     policy_numbers = []
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                
-                if not text:
+        for text in pages:
+            if not text:
+                continue
+            
+            lines = text.split('\n')
+            
+            # Look for 9-digit policy numbers in the table
+            for line in lines:
+                # Skip obvious header lines
+                if 'S.No' in line or 'Policy' in line.translate(DROP_DOTS) and 'No' in line:
                     continue
                 
-                lines = text.split('\n')
+                # Find 9-digit policy numbers
+                # Look for pattern: 9 digits followed by or preceded by text (customer name)
+                # This handles both "PolicyNo Name" and "Name PolicyNo" formats
                 
-                # Look for 9-digit policy numbers in the table
-                for line in lines:
-                    # Skip obvious header lines
-                    if 'S.No' in line or 'Policy' in line.replace('.', '') and 'No' in line:
-                        continue
-                    
-                    # Find 9-digit policy numbers
-                    # Look for pattern: 9 digits followed by or preceded by text (customer name)
-                    # This handles both "PolicyNo Name" and "Name PolicyNo" formats
-                    
-                    # Pattern 1: Find all 9-digit numbers
-                    policy_matches = re.findall(r'\b(\d{9})\b', line)
-                    
-                    for policy_no in policy_matches:
-                        # Verify this line has some alphabetic text (likely a name)
-                        # This helps filter out non-policy numbers
-                        if re.search(r'[A-Za-z]{3,}', line):
-                            if policy_no not in policy_numbers:
-                                policy_numbers.append(policy_no)
+                # Pattern 1: Find all 9-digit numbers
+                policy_matches = POLICY_NUMBER_RE.findall(line)
+                
+                for policy_no in policy_matches:
+                    # Verify this line has some alphabetic text (likely a name)
+                    # This helps filter out non-policy numbers
+                    if ALPHA_WORD_RE.search(line):
+                        policy_numbers.append(policy_no)
         
-        return policy_numbers
+        # De-duplicate in one pass, keeping first-seen order
+        return list(dict.fromkeys(policy_numbers))
     except Exception as e:
         print(f"  ❌ Error extracting policies from {pdf_path.name}: {e}")
         return []
@@ -205,46 +245,57 @@ def get_policies_without_agent_code(supabase):
     try:
         response = supabase.table('policies').select('policy_number, agent_code').execute()
         
-        policies_without_agent = []
-        for policy in response.data:
-            agent_code = policy.get('agent_code')
-            # Check if agent_code is None, empty string, or whitespace
-            if not agent_code or agent_code.strip() == '':
-                policies_without_agent.append(policy)
-        
-        return policies_without_agent
+        # agent_code is None, empty string, or whitespace
+        return [
+            policy for policy in response.data
+            if not (policy.get('agent_code') or '').strip()
+        ]
     except Exception as e:
         print(f"❌ Error fetching policies: {e}")
         return []
 
-def get_all_policy_numbers(supabase):
-    """Get all existing policy numbers from database"""
+def get_existing_policy_numbers(supabase, policy_numbers):
+    """Get which of the given policy numbers already exist in the database"""
+    policy_numbers = list(policy_numbers)
+    existing = set()
     try:
-        response = supabase.table('policies').select('policy_number').execute()
-        return set(policy['policy_number'] for policy in response.data)
+        for start in range(0, len(policy_numbers), LOOKUP_BATCH_SIZE):
+            chunk = policy_numbers[start:start + LOOKUP_BATCH_SIZE]
+            response = supabase.table('policies').select('policy_number').in_('policy_number', chunk).execute()
+            existing.update(policy['policy_number'] for policy in response.data)
+        return existing
     except Exception as e:
         print(f"❌ Error fetching policy numbers: {e}")
         return set()
 
+def find_customer(supabase, customer_name):
+    """Find existing customer by name (case-insensitive); returns customer_id or None"""
+    response = supabase.table('customers').select('customer_id, customer_name').ilike('customer_name', customer_name).execute()
+    
+    if response.data and len(response.data) > 0:
+        # Customer exists
+        return response.data[0]['customer_id']
+    
+    return None
+
+def build_customer_row(customer_name):
+    """Build the row inserted for a customer found in a PDF"""
+    return {
+        'customer_name': customer_name,
+        'extraction_method': 'pdf_auto_import',
+        'created_date': datetime.now().isoformat(),
+        'last_updated': datetime.now().isoformat()
+    }
+
 def find_or_create_customer(supabase, customer_name):
     """Find existing customer by name or create new one"""
     try:
-        # Try to find existing customer by name (case-insensitive)
-        response = supabase.table('customers').select('customer_id, customer_name').ilike('customer_name', customer_name).execute()
-        
-        if response.data and len(response.data) > 0:
-            # Customer exists
-            return response.data[0]['customer_id']
+        customer_id = find_customer(supabase, customer_name)
+        if customer_id:
+            return customer_id
         
         # Create new customer
-        new_customer = {
-            'customer_name': customer_name,
-            'extraction_method': 'pdf_auto_import',
-            'created_date': datetime.now().isoformat(),
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        response = supabase.table('customers').insert(new_customer).execute()
+        response = supabase.table('customers').insert(build_customer_row(customer_name)).execute()
         
         if response.data and len(response.data) > 0:
             return response.data[0]['customer_id']
@@ -254,18 +305,42 @@ def find_or_create_customer(supabase, customer_name):
         print(f"  ❌ Error finding/creating customer {customer_name}: {e}")
         return None
 
+def create_customers(supabase, customer_names):
+    """Create customers with multi-row inserts
+    Returns dict: {customer_name.lower(): customer_id}"""
+    customer_ids = {}
+    
+    for start in range(0, len(customer_names), INSERT_BATCH_SIZE):
+        batch = customer_names[start:start + INSERT_BATCH_SIZE]
+        try:
+            response = supabase.table('customers').insert(
+                [build_customer_row(customer_name) for customer_name in batch]
+            ).execute()
+            for customer in response.data:
+                customer_ids[customer['customer_name'].lower()] = customer['customer_id']
+        except Exception as e:
+            print(f"  ⚠️  Batch customer insert failed, retrying one at a time: {e}")
+            for customer_name in batch:
+                customer_ids[customer_name.lower()] = find_or_create_customer(supabase, customer_name)
+    
+    return customer_ids
+
+def build_policy_row(policy_number, customer_id, agent_code):
+    """Build the row inserted for a policy found in a PDF"""
+    return {
+        'policy_number': policy_number,
+        'customer_id': customer_id,
+        'agent_code': agent_code,
+        'status': 'Active',
+        'extraction_method': 'pdf_auto_import',
+        'created_date': datetime.now().isoformat(),
+        'last_updated': datetime.now().isoformat()
+    }
+
 def create_policy(supabase, policy_number, customer_id, agent_code):
     """Create a new policy in the database"""
     try:
-        new_policy = {
-            'policy_number': policy_number,
-            'customer_id': customer_id,
-            'agent_code': agent_code,
-            'status': 'Active',
-            'extraction_method': 'pdf_auto_import',
-            'created_date': datetime.now().isoformat(),
-            'last_updated': datetime.now().isoformat()
-        }
+        new_policy = build_policy_row(policy_number, customer_id, agent_code)
         
         supabase.table('policies').insert(new_policy).execute()
         return True
@@ -273,6 +348,15 @@ def create_policy(supabase, policy_number, customer_id, agent_code):
         print(f"  ❌ Error creating policy {policy_number}: {e}")
         return False
 
+def create_policies(supabase, new_policies):
+    """Create several policies with a single insert request"""
+    try:
+        supabase.table('policies').insert(new_policies).execute()
+        return True
+    except Exception as e:
+        print(f"  ⚠️  Batch insert failed, retrying one policy at a time: {e}")
+        return False
+
 def update_agent_code(supabase, policy_number, agent_code):
     """Update agent code for a specific policy"""
     try:
@@ -285,6 +369,18 @@ def update_agent_code(supabase, policy_number, agent_code):
         print(f"  ❌ Error updating policy {policy_number}: {e}")
         return False
 
+def update_agent_codes(supabase, policy_numbers, agent_code):
+    """Update the agent code for several policies with a single request"""
+    try:
+        supabase.table('policies').update({
+            'agent_code': agent_code,
+            'last_updated': datetime.now().isoformat()
+        }).in_('policy_number', policy_numbers).execute()
+        return True
+    except Exception as e:
+        print(f"  ⚠️  Batch update failed, retrying one policy at a time: {e}")
+        return False
+
 def main():
     print("=" * 70)
     print("🔄 UPDATE MISSING AGENT CODES FROM PREMIUM DUE PDFs")
@@ -320,11 +416,8 @@ def main():
         print("✅ All policies have agent codes!")
         return
     
-    # Create a mapping of policy_number -> policy_number for quick lookup
-    policy_mapping = {
-        policy['policy_number']: policy['policy_number'] 
-        for policy in policies_without_agent
-    }
+    # Policy numbers still missing an agent code, for quick lookup
+    policy_mapping = {policy['policy_number'] for policy in policies_without_agent}
     
     # Process PDF files
     pdf_files = list(incoming_folder.glob('*.pdf'))
@@ -337,26 +430,36 @@ def main():
     commission_count = 0
     unknown_count = 0
     
+    # Each page is parsed at most once here; page texts and agent codes are
+    # reused when scanning for missing policies below
+    pdf_pages = {}
+    pdf_agent_codes = {}
+    
+    # PDF parsing is CPU-bound: read every first page (type and agent code only
+    # need the header) across worker processes, then queue the remaining pages
+    # of the files that carry an agent code while the loop below runs
+    executor = ProcessPoolExecutor(max_workers=max(1, min(len(pdf_files), os.cpu_count() or 1)))
+    header_pages = dict(zip(pdf_files, executor.map(extract_pdf_pages, pdf_files, repeat(0), repeat(1))))
+    pdf_headers = {pdf_file: get_agent_code(pdf_file, pages) for pdf_file, pages in header_pages.items()}
+    remaining_pages = {
+        pdf_file: executor.submit(extract_pdf_pages, pdf_file, 1)
+        for pdf_file, (_, agent_code) in pdf_headers.items()
+        if agent_code
+    }
+    
     for pdf_file in pdf_files:
         print(f"📄 Processing: {pdf_file.name}")
         
-        # Detect PDF type
-        pdf_type = detect_pdf_type(pdf_file)
+        pdf_type, agent_code = pdf_headers[pdf_file]
         
         if pdf_type == 'premium_due':
             print(f"  📋 Type: Premium Due List")
-            agent_code = extract_agent_code_from_premium_due_pdf(pdf_file)
             premium_due_count += 1
         elif pdf_type == 'commission':
             print(f"  💰 Type: Commission Bill")
-            agent_code = extract_agent_code_from_commission_pdf(pdf_file)
             commission_count += 1
         else:
             print(f"  ❓ Type: Unknown - trying both formats")
-            # Try both extraction methods
-            agent_code = extract_agent_code_from_premium_due_pdf(pdf_file)
-            if not agent_code:
-                agent_code = extract_agent_code_from_commission_pdf(pdf_file)
             unknown_count += 1
         
         if not agent_code:
@@ -364,26 +467,37 @@ def main():
             print()
             continue
         
+        # Only files with an agent code are parsed past the first page
+        pages = header_pages[pdf_file] + remaining_pages[pdf_file].result()
+        pdf_pages[pdf_file] = pages
+        pdf_agent_codes[pdf_file] = agent_code
         print(f"  🏢 Agent Code: {agent_code}")
         
         # Extract all policy numbers from this PDF
-        policy_numbers = extract_policy_numbers_from_pdf(pdf_file)
+        policy_numbers = extract_policy_numbers_from_pdf(pdf_file, pages)
         print(f"  📋 Found {len(policy_numbers)} policy numbers in PDF")
         
-        # Update policies that are in our "missing agent code" list
+        # Update policies that are in our "missing agent code" list,
+        # one request per batch instead of one per policy
+        matched_policies = [p for p in policy_numbers if p in policy_mapping]
         file_updates = 0
-        for policy_number in policy_numbers:
-            if policy_number in policy_mapping:
-                
-                if update_agent_code(supabase, policy_number, agent_code):
-                    print(f"  ✅ Updated policy {policy_number} with agent code {agent_code}")
-                    file_updates += 1
-                    total_updates += 1
+        for start in range(0, len(matched_policies), LOOKUP_BATCH_SIZE):
+            batch = matched_policies[start:start + LOOKUP_BATCH_SIZE]
+            if update_agent_codes(supabase, batch, agent_code):
+                updated = batch
+            else:
+                updated = [p for p in batch if update_agent_code(supabase, p, agent_code)]
+            for policy_number in updated:
+                print(f"  ✅ Updated policy {policy_number} with agent code {agent_code}")
+            file_updates += len(updated)
+            total_updates += len(updated)
         
         updates_by_file[pdf_file.name] = file_updates
         print(f"  📊 Updated {file_updates} policies from this file")
         print()
     
+    executor.shutdown()
+    
     # Summary for agent code updates
     print("=" * 70)
     print("📊 AGENT CODE UPDATE SUMMARY")
@@ -425,34 +539,13 @@ def main():
     print("=" * 70)
     print()
     
-    # Get all existing policy numbers from database
-    print("📊 Fetching existing policy numbers from database...")
-    existing_policies = get_all_policy_numbers(supabase)
-    print(f"✅ Found {len(existing_policies)} existing policies in database")
-    print()
-    
     # Collect all policy numbers and details from PDFs
     print("📄 Scanning PDFs for policy numbers and customer names...")
     all_pdf_policies = {}  # {policy_number: {name, agent_code}}
     
-    for pdf_file in pdf_files:
-        # Detect PDF type and extract agent code
-        pdf_type = detect_pdf_type(pdf_file)
-        
-        if pdf_type == 'premium_due':
-            agent_code = extract_agent_code_from_premium_due_pdf(pdf_file)
-        elif pdf_type == 'commission':
-            agent_code = extract_agent_code_from_commission_pdf(pdf_file)
-        else:
-            agent_code = extract_agent_code_from_premium_due_pdf(pdf_file)
-            if not agent_code:
-                agent_code = extract_agent_code_from_commission_pdf(pdf_file)
-        
-        if not agent_code:
-            continue
-        
+    for pdf_file, agent_code in pdf_agent_codes.items():
         # Extract policy details (policy number + customer name)
-        policy_details = extract_policy_details_from_pdf(pdf_file)
+        policy_details = extract_policy_details_from_pdf(pdf_file, pdf_pages[pdf_file])
         
         for policy_number, customer_name in policy_details.items():
             if policy_number not in all_pdf_policies:
@@ -464,6 +557,12 @@ def main():
     print(f"✅ Found {len(all_pdf_policies)} unique policy numbers in PDFs")
     print()
     
+    # Check only the PDF policy numbers against the database, in a few IN queries
+    print("📊 Checking which of them already exist in the database...")
+    existing_policies = get_existing_policy_numbers(supabase, all_pdf_policies)
+    print(f"✅ Found {len(existing_policies)} of them already in database")
+    print()
+    
     # Find missing policies
     missing_policies = []
     for policy_number, details in all_pdf_policies.items():
@@ -493,20 +592,57 @@ def main():
         created_count = 0
         failed_count = 0
         
+        # Look up each distinct customer once; new ones are created in bulk
+        customer_ids = {}
+        new_customer_names = []
+        for policy in missing_policies:
+            customer_key = policy['customer_name'].lower()
+            if customer_key in customer_ids:
+                continue
+            try:
+                customer_ids[customer_key] = find_customer(supabase, policy['customer_name'])
+            except Exception as e:
+                print(f"  ❌ Error finding customer {policy['customer_name']}: {e}")
+                customer_ids[customer_key] = None
+                continue
+            if customer_ids[customer_key] is None:
+                new_customer_names.append(policy['customer_name'])
+        
+        if new_customer_names:
+            print(f"  👤 Creating {len(new_customer_names)} new customers...")
+            customer_ids.update(create_customers(supabase, new_customer_names))
+        
+        # Resolve customers first so the policies can be inserted in batches
+        pending_policies = []
         for policy in missing_policies:
-            # Find or create customer
-            customer_id = find_or_create_customer(supabase, policy['customer_name'])
+            customer_id = customer_ids.get(policy['customer_name'].lower())
             
             if customer_id:
-                # Create policy
+                pending_policies.append((policy, customer_id))
+            else:
+                failed_count += 1
+                print(f"  ❌ Failed to create customer for: {policy['customer_name']}")
+        
+        for start in range(0, len(pending_policies), INSERT_BATCH_SIZE):
+            batch = pending_policies[start:start + INSERT_BATCH_SIZE]
+            new_policies = [
+                build_policy_row(policy['policy_number'], customer_id, policy['agent_code'])
+                for policy, customer_id in batch
+            ]
+            
+            if create_policies(supabase, new_policies):
+                created_count += len(batch)
+                for policy, _ in batch:
+                    print(f"  ✅ Created: {policy['policy_number']} - {policy['customer_name']}")
+                continue
+            
+            # One bad row fails the whole batch - fall back so the rest still get created
+            for policy, customer_id in batch:
                 if create_policy(supabase, policy['policy_number'], customer_id, policy['agent_code']):
                     created_count += 1
                     print(f"  ✅ Created: {policy['policy_number']} - {policy['customer_name']}")
                 else:
                     failed_count += 1
-            else:
-                failed_count += 1
-                print(f"  ❌ Failed to create customer for: {policy['customer_name']}")
         
         print()
         print(f"📊 Creation Summary:")
@@ -64,6 +64,26 @@ CREATE TABLE IF NOT EXISTS policies (
     last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Make sure policies are removed with their customer (for existing databases)
+DO $$ 
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.referential_constraints 
+               WHERE constraint_name = 'policies_customer_id_fkey' AND delete_rule <> 'CASCADE') THEN
+        ALTER TABLE policies DROP CONSTRAINT policies_customer_id_fkey;
+        ALTER TABLE policies ADD CONSTRAINT policies_customer_id_fkey 
+            FOREIGN KEY (customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE;
+    END IF;
+END $$;
+
+-- Add payment_period column if it doesn't exist (for existing databases)
+DO $$ 
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
+                   WHERE table_name = 'policies' AND column_name = 'payment_period') THEN
+        ALTER TABLE policies ADD COLUMN payment_period TEXT;
+    END IF;
+END $$;
+
 -- Premium records table
 CREATE TABLE IF NOT EXISTS premium_records (
     id BIGSERIAL PRIMARY KEY,
@@ -111,6 +131,8 @@ DROP INDEX IF EXISTS idx_customers_email;
 DROP INDEX IF EXISTS idx_customers_aadhaar;
 DROP INDEX IF EXISTS idx_customers_nickname;
 DROP INDEX IF EXISTS idx_policies_customer;
+DROP INDEX IF EXISTS idx_policies_customer_fup;
+DROP INDEX IF EXISTS idx_policies_number_prefix;
 DROP INDEX IF EXISTS idx_policies_agent;
 DROP INDEX IF EXISTS idx_policies_status;
 DROP INDEX IF EXISTS idx_premium_records_policy;
@@ -122,11 +144,29 @@ CREATE INDEX idx_customers_email ON customers(email);
 CREATE INDEX idx_customers_aadhaar ON customers(aadhaar_number);
 CREATE INDEX idx_customers_nickname ON customers(nickname);
 CREATE INDEX idx_policies_customer ON policies(customer_id);
+CREATE INDEX idx_policies_customer_fup ON policies(customer_id, current_fup_date DESC NULLS LAST);
+-- text_pattern_ops lets the calculator's LIKE 'prefix%' lookup use the index
+CREATE INDEX idx_policies_number_prefix ON policies(policy_number text_pattern_ops);
 CREATE INDEX idx_policies_agent ON policies(agent_code);
 CREATE INDEX idx_policies_status ON policies(status);
 CREATE INDEX idx_premium_records_policy ON premium_records(policy_number);
 CREATE INDEX idx_premium_records_due_date ON premium_records(due_date);
 
+-- Trigram indexes for the app's substring search (ILIKE '%query%' across
+-- these columns, OR'ed together). A B-tree can't serve a leading wildcard;
+-- GIN trigram indexes can, and Postgres combines them with a BitmapOr.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_customers_name_trgm ON customers USING GIN (customer_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_phone_trgm ON customers USING GIN (phone_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_alt_phone_trgm ON customers USING GIN (alt_phone_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_email_trgm ON customers USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_aadhaar_trgm ON customers USING GIN (aadhaar_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_nickname_trgm ON customers USING GIN (nickname gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_address_trgm ON customers USING GIN (full_address gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_policies_number_trgm ON policies USING GIN (policy_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_policies_agent_trgm ON policies USING GIN (agent_code gin_trgm_ops);
+
 -- Enable Row Level Security (RLS) - Optional, uncomment if needed
 -- ALTER TABLE customers ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE policies ENABLE ROW LEVEL SECURITY;
@@ -158,6 +198,60 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Customers with no policies, found with an anti-join on idx_policies_customer
+-- (used by scripts/delete_customers_without_policies.py)
+CREATE OR REPLACE FUNCTION get_orphan_customers()
+RETURNS TABLE (customer_id BIGINT, customer_name TEXT) AS $$
+    SELECT c.customer_id, c.customer_name
+    FROM customers c
+    WHERE NOT EXISTS (SELECT 1 FROM policies p WHERE p.customer_id = c.customer_id)
+    ORDER BY c.customer_id;
+$$ LANGUAGE sql STABLE;
+
+-- Distinct, trimmed customer addresses for the app's address dropdown
+-- (COLLATE "C" keeps the codepoint order the app used to sort by)
+CREATE OR REPLACE FUNCTION distinct_addresses()
+RETURNS TABLE (full_address TEXT) AS $$
+    SELECT DISTINCT trim(c.full_address) COLLATE "C"
+    FROM customers c
+    WHERE trim(c.full_address) <> '' AND lower(c.full_address) <> 'n/a'
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+-- Insert a policy, or update it only when the incoming document is newer than
+-- the stored row, in one statement (used by add_new_policy in the app).
+-- p_row is the full insert row; p_updates holds the fields to overwrite.
+-- Returns 'inserted', 'updated', or 'stale'.
+CREATE OR REPLACE FUNCTION upsert_policy_if_newer(p_row JSONB, p_updates JSONB)
+RETURNS TEXT AS $$
+DECLARE
+    was_inserted BOOLEAN;
+BEGIN
+    INSERT INTO policies AS p
+    SELECT * FROM jsonb_populate_record(NULL::policies, p_row)
+    ON CONFLICT (policy_number) DO UPDATE SET
+        agent_code = CASE WHEN p_updates ? 'agent_code' THEN EXCLUDED.agent_code ELSE p.agent_code END,
+        plan_name = CASE WHEN p_updates ? 'plan_name' THEN EXCLUDED.plan_name ELSE p.plan_name END,
+        date_of_commencement = CASE WHEN p_updates ? 'date_of_commencement' THEN EXCLUDED.date_of_commencement ELSE p.date_of_commencement END,
+        payment_period = CASE WHEN p_updates ? 'payment_period' THEN EXCLUDED.payment_period ELSE p.payment_period END,
+        current_fup_date = CASE WHEN p_updates ? 'current_fup_date' THEN EXCLUDED.current_fup_date ELSE p.current_fup_date END,
+        sum_assured = CASE WHEN p_updates ? 'sum_assured' THEN EXCLUDED.sum_assured ELSE p.sum_assured END,
+        premium_amount = CASE WHEN p_updates ? 'premium_amount' THEN EXCLUDED.premium_amount ELSE p.premium_amount END,
+        status = CASE WHEN p_updates ? 'status' THEN EXCLUDED.status ELSE p.status END,
+        maturity_date = CASE WHEN p_updates ? 'maturity_date' THEN EXCLUDED.maturity_date ELSE p.maturity_date END,
+        policy_term = CASE WHEN p_updates ? 'policy_term' THEN EXCLUDED.policy_term ELSE p.policy_term END,
+        last_payment_date = CASE WHEN p_updates ? 'last_payment_date' THEN EXCLUDED.last_payment_date ELSE p.last_payment_date END,
+        last_updated = EXCLUDED.last_updated
+    WHERE COALESCE(p.last_updated, p.created_date, '1900-01-01') < EXCLUDED.last_updated
+    RETURNING (xmax = 0) INTO was_inserted;
+
+    IF NOT FOUND THEN
+        RETURN 'stale';
+    END IF;
+    RETURN CASE WHEN was_inserted THEN 'inserted' ELSE 'updated' END;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Create triggers to automatically update last_updated
 DROP TRIGGER IF EXISTS update_customers_updated_at ON customers;
 DROP TRIGGER IF EXISTS update_policies_updated_at ON policies;